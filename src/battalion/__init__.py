@@ -1,2 +1,23 @@
-from version import Version
-__version__ = Version('battalion')
+import sys
+import types
+
+
+class _Battalion(types.ModuleType):
+    """
+    Looking up the version imports pip, which takes longer than importing
+    all of battalion, so it is only done when __version__ is asked for
+    """
+
+    @property
+    def __version__(self):
+        try:
+            return self._version
+        except AttributeError:
+            from version import Version
+            self._version = Version('battalion')
+            return self._version
+
+
+_module = sys.modules[__name__]
+sys.modules[__name__] = _Battalion(__name__)
+sys.modules[__name__].__dict__.update(_module.__dict__)
@@ -3,6 +3,7 @@ import logging
 from inspect import getdoc, cleandoc, isclass
 from .base import BaseCommand
 from .handler import HandlerMarker
+from .registry import registry, LazyCommand
 from .utils import get_command_args, get_command_spec
 
 
@@ -49,17 +50,32 @@ class AutoDocCommand(BaseCommand):
 
     def generate_commands_doc(self):
         for name, func in self.commands.items():
-            if isclass(func) and issubclass(func, HandlerMarker):
-                LOG.debug('Documenting Command %s', name)
-                self.commands[name] = func()
-            else:
-                LOG.debug('Documenting Command %s', name)
-                new_command_doc = getdoc(func) or """{0}""".format(name)
-                new_command_doc += "\n\n"
-                new_command_doc += self.generate_command_usage(name, func)
-                new_command_doc += self.generate_command_options(func)
-                func.__autodoc__ = cleandoc(new_command_doc)
-                self.commands[name] = func
+            # lazy commands are documented when they are loaded
+            if not isinstance(func, LazyCommand):
+                self.generate_command_doc(name, func)
+
+    def generate_command_doc(self, name, func):
+        LOG.debug('Documenting Command %s', name)
+        if isclass(func) and issubclass(func, HandlerMarker):
+            func = func()
+        else:
+            new_command_doc = getdoc(func) or """{0}""".format(name)
+            new_command_doc += "\n\n"
+            new_command_doc += self.generate_command_usage(name, func)
+            new_command_doc += self.generate_command_options(func)
+            func.__autodoc__ = cleandoc(new_command_doc)
+        self.commands[name] = func
+        return func
+
+    def load_command(self, name):
+        command = self.commands[name]
+        if isinstance(command, LazyCommand):
+            command = registry.load(self.key, name)
+        # commands registered after we were documented, which includes
+        # anything registered by importing a lazy command's module
+        if isclass(command) or not hasattr(command, '__autodoc__'):
+            command = self.generate_command_doc(name, command)
+        return command
 
     def generate_usage(self):
         docstring = ""
@@ -1,11 +1,12 @@
 from __future__ import absolute_import
-from docopt import docopt, DocoptExit
-from inspect import cleandoc
 from .exceptions import NoSuchCommand
-from .registry import registry
+from .registry import registry, command_key
 from .handler import HandlerMarker
 from .state import StateMixin, state
-from .utils import cleanup_data, get_command_spec, CommandInvocation
+from .usage import usage_cache
+from .spec import get_spec
+from .utils import cleanup_data, CommandInvocation
+from .timing import phase
 
 class BaseCommand(StateMixin):
     """
@@ -17,6 +18,15 @@ class BaseCommand(StateMixin):
         version = 'UNKNOWN'
         default_config = None
         config_file = None
+        # more than 1 builds a command's independent fixtures concurrently
+        fixture_workers = 0
+        # size of the pool used by timeouts and CommandInvocation.submit
+        command_workers = 10
+        # argument names --trace masks, None keeps the Tracer defaults
+        trace_redact = None
+        # where @command(cache=...) results are kept, None for ~/.<cli>_cache
+        cache_dir = None
+        cache_max_bytes = 64 * 1024 * 1024
         options = [('-h, --help', 'Show this screen.'),
                    ('--version', 'Show version.')]
 
@@ -30,7 +40,17 @@ class BaseCommand(StateMixin):
 
     @property
     def key(self):
-        return (self.cli, self.name)
+        key = self.__dict__.get('_key')
+        if key is None:
+            key = self._key = command_key(self.cli, self._state.parent) + (self.name,)
+        return key
+
+    @property
+    def path(self):
+        """
+        The dotted path of a handler beneath its cli, empty for the cli
+        """
+        return '.'.join(self.key[1:])
 
     @property
     def commands(self):
@@ -44,6 +64,15 @@ class BaseCommand(StateMixin):
     def docstring(self):
         raise NotImplementedError
 
+    @property
+    def state_layer(self):
+        # cleaned up once and then reused so the global state can tell
+        # when nothing but the options have changed between runs
+        layer = self.__dict__.get('_state_layer')
+        if layer is None:
+            layer = self._state_layer = cleanup_data(self._state)
+        return layer
+
     @property
     def docopt_options(self):
         return {'options_first': True,
@@ -51,15 +80,10 @@ class BaseCommand(StateMixin):
 
     def format_command_args(self, command, kwargs):
         new_kwargs = {}
-        command_kwargs = get_command_spec(command)
+        spec = get_spec(command)
+        command_kwargs = spec.command_kwargs(registry.fixture_names)
         for k, v in sorted(kwargs.items()):
-            if k.startswith('--'):
-                k = k[2:]
-            if k.startswith('-'):
-                k = k[1:]
-            k = k.replace('-', '_')
-            k = k.replace('<', '')
-            k = k.replace('>', '')
+            k = spec.option_key(k)
             # check if arg
             if v is None or v == 'None':
                 v = new_kwargs.get(k, None) or command_kwargs.get(k, None) or None
@@ -67,10 +91,29 @@ class BaseCommand(StateMixin):
                 new_kwargs[k] = v
         return new_kwargs
 
+    def load_command(self, name):
+        return self.commands[name]
+
+    def invocation(self, command):
+        """
+        Returns the CommandInvocation of one of our commands, they hold
+        nothing but the command and us so one is kept per command
+        """
+        invocations = self.__dict__.get('_invocations')
+        if invocations is None:
+            invocations = self._invocations = {}
+        try:
+            return invocations[command]
+        except KeyError:
+            invocation = invocations[command] = CommandInvocation(command, self)
+            return invocation
+
     def get_options(self, argv):
-        options = docopt(self.docstring,
-                         argv,
-                         **self.docopt_options)
+        with phase('parse options'):
+            options = usage_cache.parse(self.__class__,
+                                        self.__autodoc__,
+                                        argv,
+                                        **self.docopt_options)
         return options
 
     def get_command(self, options):
@@ -78,21 +121,42 @@ class BaseCommand(StateMixin):
         if command_name is None or command_name is False:
             raise SystemExit(self.docstring)
         try:
-            command = self.commands[command_name]
+            with phase('load command'):
+                command = self.load_command(command_name)
         except KeyError:
             raise NoSuchCommand(command_name, self)
-        state.add_state(cleanup_data(self._state))
+        state.add_state(self.state_layer)
         state.add_options(cleanup_data(options))
         return command, args
 
-    def dispatch(self, argv):
-        options = self.get_options(argv)
+    def dispatch(self, argv, options=None):
+        if options is None:
+            options = self.get_options(argv)
         command, args = self.get_command(options)
+        if isinstance(command, HandlerMarker):
+            with phase(command.name):
+                return command.dispatch(args)
         return self.run(command, args)
 
+    def resolve(self, argv, options=None):
+        """
+        Returns the cli or handler argv leads to, the command found on it
+        and the arguments left for the command, without running it
+        """
+        if options is None:
+            options = self.get_options(argv)
+        command, args = self.get_command(options)
+        if isinstance(command, HandlerMarker):
+            return command.resolve(args)
+        return self, command, args
+
+    def parse_command_args(self, command, args):
+        with phase('parse command options'):
+            command_options = usage_cache.parse(command, command.__autodoc__, args)
+            return self.format_command_args(command, command_options)
+
     def run(self, command, args):
-        command_options = docopt(cleandoc(command.__autodoc__), args)
-        kwargs = self.format_command_args(command, command_options)
-        state.compile()
-        c = CommandInvocation(command)
-        return c(**kwargs)
\ No newline at end of file
+        kwargs = self.parse_command_args(command, args)
+        with phase('compile state'):
+            state.compile()
+        return self.invocation(command)(**kwargs)
\ No newline at end of file
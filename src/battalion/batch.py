@@ -0,0 +1,136 @@
+"""
+Runs many invocations of a CLI in one process
+
+``mycli --batch FILE`` (or ``-`` for stdin) reads one invocation per line,
+either a shell style command line or a JSON list of arguments, and writes
+one JSON result per line in the same order:
+
+    {"line": 1, "argv": ["add", "1", "2"], "status": "ok", "exit": 0,
+     "result": 3.0, "stdout": "", "stderr": ""}
+
+A failing line is reported and the batch carries on. With ``--jobs N`` the
+lines are spread over N forked worker processes.
+"""
+from __future__ import absolute_import
+import sys
+import json
+import shlex
+import multiprocessing
+from StringIO import StringIO
+from .utils import redirect_output, is_stream
+from .command import exit_on_error
+
+
+def parse_line(line):
+    """
+    Returns the argv for a batch line or None for blank and comment lines,
+    raises ValueError for a line that cannot be parsed
+    """
+    if isinstance(line, unicode):
+        line = line.encode('utf-8')
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if not line.startswith(('[', '{')):
+        return shlex.split(line)
+    argv = json.loads(line)
+    if isinstance(argv, dict):
+        argv = argv.get('argv')
+    if not isinstance(argv, list):
+        raise ValueError('expected a list of arguments')
+    return [a.encode('utf-8') if isinstance(a, unicode) else str(a) for a in argv]
+
+
+def read_batch(source):
+    """
+    Yields the number and text of every line of source that is not blank
+    or a comment, they are parsed where they run so a bad one only fails
+    itself
+    """
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def run_line(cli, number, argv):
+    stdout, stderr = StringIO(), StringIO()
+    result = {'line': number, 'argv': argv, 'status': 'ok', 'exit': 0, 'result': None}
+    with redirect_output(stdout, stderr):
+        try:
+            # round tripped so the result can always be written and, from
+            # a worker, sent back to the parent
+            rv = cli.execute(argv)
+            if is_stream(rv):
+                with exit_on_error():
+                    rv = list(rv)
+            try:
+                result['result'] = json.loads(json.dumps(rv, default=repr))
+            except (TypeError, ValueError) as e:
+                # bytes that are not utf-8 or keys json cannot write
+                result.update(status='error', exit=1,
+                              error='cannot encode result: {0}'.format(e))
+        except SystemExit as e:
+            if isinstance(e.code, int) or e.code is None:
+                result['exit'] = e.code or 0
+            else:
+                print >> sys.stderr, e.code
+                result['exit'] = 1
+            if result['exit']:
+                result['status'] = 'error'
+    result['stdout'] = stdout.getvalue()
+    result['stderr'] = stderr.getvalue()
+    return result
+
+
+def run_source_line(cli, number, line):
+    try:
+        argv = parse_line(line)
+    except ValueError as e:
+        return {'line': number, 'argv': None, 'status': 'error', 'exit': 1, 'result': None,
+                'error': 'cannot parse line: {0}'.format(e), 'stdout': '', 'stderr': ''}
+    return run_line(cli, number, argv)
+
+
+# workers are forked with the cli already built so it never has to be pickled
+_worker_cli = None
+
+
+def _run_line(item):
+    return run_source_line(_worker_cli, *item)
+
+
+def run_batch(cli, source, output, jobs=1):
+    """
+    Runs every line of source on cli, writing the results to output as JSON
+    lines, returns the number of lines that failed
+    """
+    global _worker_cli
+    lines = read_batch(source)
+    pool = None
+    if jobs > 1:
+        _worker_cli = cli
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap(_run_line, lines)
+    else:
+        results = (run_source_line(cli, number, line) for number, line in lines)
+    failed = 0
+    try:
+        for result in results:
+            if result['status'] != 'ok':
+                failed += 1
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            _worker_cli = None
+    return failed
+
+
+def batch(cli, path, jobs=1):
+    if path == '-':
+        return run_batch(cli, sys.stdin, sys.stdout, jobs)
+    with open(path) as source:
+        return run_batch(cli, source, sys.stdout, jobs)
@@ -0,0 +1,258 @@
+"""
+On disk cache of command results
+
+``@command(cache=True)`` memoizes the results of a command that always
+returns the same thing for the same arguments and state, ``cache=<seconds>``
+also expires them after that long. Results are keyed by the command's
+code, its arguments with their defaults filled in and the compiled state,
+``cache_state=[names]`` narrows the state to the keys the result depends
+on. Repeating a cached invocation returns the stored result without
+building the command's fixtures or running it, ``--no-cache`` runs it
+anyway and stores the fresh result. A cached command that returns a
+generator has it collected into a list.
+
+Results are pickled to ``~/.<cli>_cache`` (the ``cache_dir`` state
+setting), one file per key. Entries are written to a temporary file and
+renamed into place so processes sharing the cache never read a partial
+one, and once they take more than ``cache_max_bytes`` the least recently
+used are removed.
+"""
+from __future__ import absolute_import
+import os
+import json
+import time
+import errno
+import fcntl
+import hashlib
+import logging
+import tempfile
+from contextlib import contextmanager
+from types import CodeType
+import cPickle as pickle
+
+
+LOG = logging.getLogger(__name__)
+
+MAX_BYTES = 64 * 1024 * 1024
+# eviction makes room down to this fraction of the limit so the next few
+# writes do not have to scan the cache again
+LOW_WATER = 0.8
+# temporary files left this long by a writer that died are removed
+STALE_SECONDS = 3600
+# state keys that only change how a run is reported, not its results
+IGNORED_STATE = frozenset(['cli', 'no_cache', 'profile', 'trace', 'trace_format',
+                           'jobs', 'map', 'threads', 'as_completed'])
+
+
+class CachePolicy(object):
+    __slots__ = ('ttl', 'state')
+
+    def __init__(self, ttl=None, state=None):
+        self.ttl = ttl
+        self.state = tuple(state) if state is not None else None
+
+
+def code_hash(code, digest=None):
+    """
+    Hashes a function's code, so editing a command invalidates its results
+    """
+    digest = digest or hashlib.sha1()
+    digest.update(code.co_code)
+    digest.update(repr((code.co_names, code.co_varnames)))
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            # nested functions, their repr holds their address
+            code_hash(const, digest)
+        else:
+            digest.update(repr(const))
+    return digest
+
+
+# code object -> its hash, a code object never changes once compiled
+_code_hashes = {}
+
+
+def cache_key(command, arguments, state, policy):
+    code = command.func_code
+    try:
+        identity = _code_hashes[code]
+    except KeyError:
+        identity = _code_hashes[code] = code_hash(code).hexdigest()
+    if policy.state is None:
+        keys = [k for k in state.keys() if k not in IGNORED_STATE]
+    else:
+        keys = policy.state
+    data = json.dumps([command.__module__, code.co_name,
+                       identity,
+                       arguments,
+                       dict((k, state[k]) for k in keys)],
+                      sort_keys=True, default=repr)
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache(object):
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        Returns (True, value) for a stored result that has not expired,
+        otherwise (False, None)
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires, value = pickle.load(f)
+        except IOError:
+            return False, None
+        except Exception:
+            LOG.debug('removing unreadable cache entry %s', path)
+            self._remove(path)
+            return False, None
+        if expires is not None and expires < time.time():
+            self._remove(path)
+            return False, None
+        try:
+            # the modification time orders entries for eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores value under key, returns False if value cannot be pickled or
+        the cache cannot be written to
+        """
+        expires = time.time() + ttl if ttl is not None else None
+        try:
+            data = pickle.dumps((expires, value), pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            LOG.debug('not caching result of %s: %s', key, e)
+            return False
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        tmp = None
+        try:
+            try:
+                os.makedirs(directory, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.rename(tmp, path)
+            tmp = None
+            self._grow(len(data))
+        except (OSError, IOError) as e:
+            # a read only or full disk only costs the cached result
+            LOG.debug('not caching result of %s: %s', key, e)
+            if tmp is not None:
+                self._remove(tmp)
+            return False
+        return True
+
+    def clear(self):
+        with self._lock():
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._write_size(0)
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_size(self):
+        try:
+            with open(os.path.join(self.directory, '.size')) as f:
+                return int(f.read() or 0)
+        except (IOError, ValueError):
+            return None
+
+    def _write_size(self, size):
+        with open(os.path.join(self.directory, '.size'), 'w') as f:
+            f.write(str(size))
+
+    def _grow(self, size):
+        # a running total saves scanning the cache on every write, it only
+        # overcounts when an entry is replaced, which just evicts sooner
+        with self._lock():
+            total = self._read_size()
+            total = self._evict() if total is None else total + size
+            if total > self.max_bytes:
+                total = self._evict()
+            self._write_size(total)
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            directory = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(directory):
+                continue
+            for entry in os.listdir(directory):
+                path = os.path.join(directory, entry)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if entry.startswith('.tmp'):
+                    if stat.st_mtime < time.time() - STALE_SECONDS:
+                        self._remove(path)
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until they fit under the
+        low water mark, returns the size of what is left
+        """
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        if total <= self.max_bytes:
+            return total
+        for path, _, size in entries:
+            if total <= self.max_bytes * LOW_WATER:
+                break
+            self._remove(path)
+            total -= size
+        LOG.debug('evicted cache entries down to %s bytes', total)
+        return total
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_caches = {}
+
+
+def get_cache(state):
+    """
+    Returns the result cache for the cli of the compiled state, or None
+    when its directory cannot be created
+    """
+    directory = os.path.expanduser(state.cache_dir or '~/.{0}_cache'.format(state.cli.name))
+    max_bytes = state.cache_max_bytes or MAX_BYTES
+    try:
+        return _caches[directory, max_bytes]
+    except KeyError:
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                LOG.debug('not caching results in %s: %s', directory, e)
+                return None
+        cache = _caches[directory, max_bytes] = ResultCache(directory, max_bytes)
+        return cache
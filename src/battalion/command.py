@@ -2,42 +2,82 @@ from __future__ import absolute_import
 import os
 import sys
 import re
+import shlex
 import logging
 import six
-import yaml
-import traceback
-from inspect import getdoc
-from pyul.coreUtils import DotifyDict
-from docopt import docopt, DocoptExit
+from contextlib import contextmanager
+from docopt import DocoptExit
 
 from .exceptions import NoSuchCommand
 from .registry import CLIRegistrationMixin, HandlerRegistrationMixin, registry
 from .handler import HandlerMarker
 from .autodoc import AutoDocCommand
+from .config import config_cache
 from .state import state
 from .log import enable_logging
-from .utils import cleanup_data, CommandInvocation
+from .timing import phase, installed, Profiler
+from .tracing import Tracer, FORMATS as TRACE_FORMATS
+from .plan import Plan, current_plan, reset as reset_plan
+from .output import write as write_output, check_format
+from .utils import CommandInvocation, parse_doc_section, cleanup_data, is_stream
 
 
 LOG = logging.getLogger(__name__)
 
 
+@contextmanager
+def exit_on_error():
+    """
+    Reports a failure of the block and exits with its exit code
+    """
+    try:
+        yield
+    except KeyboardInterrupt:
+        print "\nAborting."
+        sys.exit(1)
+    except NoSuchCommand as e:
+        print "No such command: {0}".format(e.command)
+        print "\n".join(parse_doc_section("commands:", e.supercommand.docstring))
+        sys.exit(1)
+    except DocoptExit as e:
+        print e.message
+        sys.exit(1)
+    except SystemExit as e:
+        sys.exit(e.code)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        if hasattr(e, 'code'):
+            sys.exit(e.code)
+        else:
+            sys.exit(1)
+
+
 @six.add_metaclass(HandlerRegistrationMixin)
 class Handler(AutoDocCommand, HandlerMarker):
 
     def __init__(self):
         super(Handler, self).__init__()
 
+    @property
+    def state_layer(self):
+        # parent only places the handler under another one, like cli
+        layer = self.__dict__.get('_state_layer')
+        if layer is None:
+            layer = super(Handler, self).state_layer
+            layer.pop('parent', None)
+        return layer
+
     def __call__(self, *args, **kwargs):
         print self.__autodoc__
 
     def __getattr__(self, attr):
         if attr in self.commands:
-            cmd = self.commands[attr]
+            cmd = self.load_command(attr)
             if isinstance(cmd, Handler):
                 return cmd
             else:
-                return CommandInvocation(cmd)
+                return self.invocation(cmd)
         raise AttributeError("Unable to find attr or command for {0}".format(attr))
 
 
@@ -46,7 +86,23 @@ class CLI(AutoDocCommand):
     class State:
         options = [
             ('-d, --debug', 'Show debug messages'),
-            ('--dryrun', 'If enabled any modifying actions will not be performed [default: False]')
+            ('--dryrun', 'If enabled any modifying actions will not be performed [default: False]'),
+            ('--serve=<SOCKET>', 'Keep serving commands from this process on a unix socket'),
+            ('--fork', 'Run each command sent to --serve in a forked process [default: False]'),
+            ('--batch=<FILE>', 'Run each line of FILE, or stdin for -, as a command and print JSON results'),
+            ('--jobs=<N>', 'Number of workers --batch, --map and --apply-plan run on [default: 1]'),
+            ('--shell', 'Start an interactive shell for running commands [default: False]'),
+            ('--completion=<SHELL>', 'Print the bash, zsh or fish completion script and write its index'),
+            ('--profile', 'Print how long each phase of the run took [default: False]'),
+            ('--trace=<FILE>', 'Write a trace of every command the run invokes to FILE'),
+            ('--trace-format=<FORMAT>', 'Format of the --trace file, chrome or json [default: chrome]'),
+            ('--plan=<FILE>', 'Dry run the command and save what it would do to FILE'),
+            ('--apply-plan=<FILE>', 'Perform the actions of a plan saved by --plan'),
+            ('--map=<FILE>', 'Run the command once per line of FILE, or stdin for -, with the line added to its arguments'),
+            ('--threads', 'Run --map on threads instead of processes [default: False]'),
+            ('--as-completed', 'Return --map results as they finish instead of in input order [default: False]'),
+            ('--output=<FORMAT>', 'Format of the results, text, json, jsonl or msgpack [default: text]'),
+            ('--no-cache', 'Run cached commands again instead of reusing their results [default: False]')
         ]
         cwd = os.getcwd()
 
@@ -54,50 +110,59 @@ class CLI(AutoDocCommand):
     def main(cls, argv=None):
         if argv is None:
             argv = sys.argv[1:]
-        rv = cls()(*argv)
-        if rv:
-            print rv
+        cli = cls()
+        rv = cli(list(argv))
+        cli.write_result(rv)
         return rv
 
     def __init__(self):
         self.log = logging.getLogger(self.name)
+        # kept off the state so a command's own --output option is not
+        # taken for it
+        self.output_format = 'text'
         state.cli = self
         super(CLI, self).__init__()
 
     def __call__(self, *args):
         rv = None
-        state.reinit()
-        self.setup_logging()
         try:
-            rv = self.dispatch(argv=" ".join(args))
-        except KeyboardInterrupt:
-            print "\nAborting."
-            sys.exit(1)
-        except NoSuchCommand as e:
-            print "No such command: {0}".format(e.command)
-            print "\n".join(parse_doc_section("commands:", getdoc(e.supercommand)))
-            sys.exit(1)
-        except DocoptExit as e:
-            print e.message
-            sys.exit(1)
-        except SystemExit as e:
-            sys.exit(e.code)
-        except:
-            traceback.print_exc()
-            if hasattr(e, 'code'):
-                sys.exit(e.code)
-            else:
-                sys.exit(1)
+            rv = self.execute(self.get_argv(args))
         finally:
             return rv
 
+    def execute(self, argv):
+        """
+        Runs argv and returns the commands return value, unlike calling the
+        cli, failures are raised as a SystemExit carrying the exit code
+
+        A command returning a generator or other iterator is returned as
+        is, nothing of it is run until it is iterated, see write_result.
+        """
+        state.reinit()
+        registry.reset_fixtures('cli-run')
+        reset_plan()
+        self.setup_logging()
+        with exit_on_error():
+            with phase(self.name):
+                return self.dispatch(argv=argv)
+
+    def write_result(self, rv, stream=None):
+        """
+        Writes a return value of execute to stream, stdout by default, in
+        the --output format of the run, see battalion.output. Streamed
+        return values are written item by item as they are produced and
+        their failures are raised as a SystemExit too
+        """
+        with exit_on_error():
+            write_output(rv, self.output_format, stream)
+
     def __getattr__(self, attr):
         if attr in self.commands:
-            cmd = self.commands[attr]
+            cmd = self.load_command(attr)
             if isinstance(cmd, Handler):
                 return cmd
             else:
-                return CommandInvocation(cmd)
+                return self.invocation(cmd)
         raise AttributeError("Unable to find attr or command for {0}".format(attr))
 
     @property
@@ -107,35 +172,176 @@ class CLI(AutoDocCommand):
     def setup_logging(self):
         enable_logging(self.name, level=logging.INFO)
 
+    def get_argv(self, args):
+        # A single list is taken as argv as is, a single string is taken as
+        # a whole command line and split the way a shell would, or on
+        # whitespace when its quotes do not balance
+        if len(args) == 1:
+            if isinstance(args[0], (list, tuple)):
+                return list(args[0])
+            if isinstance(args[0], six.string_types):
+                try:
+                    return shlex.split(args[0])
+                except ValueError:
+                    return args[0].split()
+        return list(args)
+
     def dispatch(self, argv):
         options = self.get_options(argv)
-        self.load_config(options)
-        command, args = self.get_command(options)
-        if isinstance(command, Handler):
-            return command.dispatch(args)
-        else:
-            args.insert(0, command.func_name)
-            return super(CLI, self).dispatch(argv)
+        # only changes how the result is written so it is kept off the state
+        output_format = options.pop('--output')
+        error = check_format(output_format)
+        if error:
+            sys.exit(error)
+        self.output_format = output_format
+        if options.get('--profile') and not installed(Profiler):
+            return self.profile(argv)
+        if options.get('--trace') and not installed(Tracer):
+            return self.trace(argv, os.path.expanduser(options['--trace']), options['--trace-format'])
+        if options.get('--serve'):
+            return self.serve(os.path.expanduser(options['--serve']), fork=options['--fork'])
+        if options.get('--batch'):
+            return self.batch(options['--batch'], jobs=int(options['--jobs']))
+        if options.get('--shell'):
+            return self.shell()
+        if options.get('--completion'):
+            return self.completion(options['--completion'])
+        with phase('load config'):
+            self.load_config(options)
+        if options.get('--apply-plan'):
+            return self.apply_plan(options, int(options['--jobs']))
+        if options.get('--map'):
+            return self.fan_out(options)
+        if options.get('--plan'):
+            options['--dryrun'] = True
+            rv = super(CLI, self).dispatch(argv, options)
+            if is_stream(rv):
+                # a generator only records its dry runs as it is iterated
+                rv = list(rv)
+            current_plan().dump(os.path.expanduser(options['--plan']))
+            return rv
+        return super(CLI, self).dispatch(argv, options)
+
+    def apply_plan(self, options, jobs=1):
+        """
+        Replays the plan saved at the --apply-plan path, see battalion.plan
+        """
+        plan = Plan.load(os.path.expanduser(options['--apply-plan']))
+        state.add_state(self.state_layer)
+        state.add_options(cleanup_data(options))
+        state.compile()
+        return plan.execute(self, workers=jobs)
+
+    def fan_out(self, options):
+        """
+        Runs the command once per record of the --map file, returning the
+        results as they come, see battalion.fanout
+        """
+        from .fanout import fan_out, read_records
+        owner, command, args = self.resolve(None, options)
+        with phase('compile state'):
+            state.compile()
+        return fan_out(owner, command, args, read_records(os.path.expanduser(options['--map'])),
+                       jobs=int(options['--jobs']), threads=options['--threads'],
+                       ordered=not options['--as-completed'])
+
+    def profile(self, argv):
+        """
+        Dispatches argv again with a Profiler installed and prints the time
+        each phase took to stderr, see battalion.timing
+        """
+        with Profiler() as profiler:
+            try:
+                with phase(self.name):
+                    return self.dispatch(argv)
+            finally:
+                profiler.report()
+
+    def trace(self, argv, path, format='chrome'):
+        """
+        Dispatches argv again with a Tracer installed and writes the trace
+        to path, see battalion.tracing
+        """
+        if format not in TRACE_FORMATS:
+            sys.exit('--trace-format must be one of {0}'.format(', '.join(TRACE_FORMATS)))
+        tracer = Tracer(redact=self._state.trace_redact)
+        with tracer:
+            try:
+                with phase(self.name):
+                    return self.dispatch(argv)
+            finally:
+                tracer.write(path, format)
+
+    def serve(self, path, fork=False):
+        """
+        Serves this cli on a unix socket until interrupted, see battalion.daemon
+        """
+        from .daemon import serve
+        serve(self, path, fork=fork)
+
+    def batch(self, path, jobs=1):
+        """
+        Runs every line of path as a command, see battalion.batch, exits
+        with 1 once they have all run if any of them failed
+        """
+        from .batch import batch
+        if batch(self, path, jobs=jobs):
+            sys.exit(1)
+
+    def shell(self):
+        """
+        Runs an interactive shell on this cli until it is exited, see
+        battalion.shell
+        """
+        from .shell import Shell
+        Shell(self).run()
+
+    def completion(self, shell):
+        """
+        Writes the completion index and returns the script that completes
+        from it, see battalion.completion
+        """
+        from .completion import write_index, completion_script
+        path = os.path.expanduser('~/.{0}_completion.json'.format(self.name))
+        try:
+            script = completion_script(shell, self.name, path)
+        except ValueError as e:
+            sys.exit(str(e))
+        # the hook runs this again to rebuild the index once it is stale
+        regenerate = [sys.executable, os.path.abspath(sys.argv[0]),
+                      '--completion={0}'.format(shell)]
+        write_index(self, path, regenerate)
+        return script
 
     def load_config(self, options):
         config_filepath = os.path.expanduser(options['--config'])
-        self._state.config_file = config_filepath
-        if os.path.exists(config_filepath):
-            with open(self._state.config_file, 'r') as ymlfile:
-                config = DotifyDict(data=yaml.load(ymlfile))
-                state.add_config(cleanup_data(config))
+        if self._state.config_file != config_filepath:
+            self._state.config_file = config_filepath
+            self._state_layer = None
+        config = config_cache.load(config_filepath)
+        if config is not None:
+            state.add_config(config)
 
-def dryrun(f, value=None):
+def dryrun(f, value=None, independent=False):
+    """
+    Wraps f so that during a dry run the call is recorded in the current
+    plan and value is returned instead of calling f. Passing value on to
+    another dry run has it replaced by what f returned when the plan is
+    replayed, see battalion.plan. Calls replay in order unless wrapped with
+    independent=True, then they only wait for the calls whose values they
+    were passed
+    """
     def wrapper(*args, **kwargs):
         if state.dryrun is True:
             if isinstance(f, CommandInvocation):
                 name = f.command.__name__
             else:
                 name = f.__name__
+            rv = current_plan().record(f, args, kwargs, value, independent)
             args = ','.join(list(args) + ["%s=%s" % (k, v) for (k, v) in kwargs.iteritems()])
             dryrun_logger = logging.getLogger(state.cli.name + '.dryrun')
             dryrun_logger.debug("DRYRUN: {0}({1})".format(name, args))
-            return value
+            return rv
         else:
             return f(*args, **kwargs)
     return wrapper
@@ -0,0 +1,162 @@
+"""
+Shell completion answered from a precomputed index
+
+``mycli --completion=bash`` (or zsh, fish) writes every command, alias and
+option name the cli knows to ``~/.<cli name>_completion.json`` and prints
+a completion script to be sourced by the shell. On TAB the script runs
+
+    python -m battalion.completion INDEX [<words>...]
+
+which only reads the index, so none of the cli's command modules are
+imported. The index records the source files the commands came from and
+is rebuilt, by running the cli again, when any of them change.
+
+Only the standard library may be imported at module level here.
+"""
+from __future__ import absolute_import
+import os
+import sys
+import json
+import subprocess
+from pipes import quote
+
+
+SCRIPTS = {
+    'bash': """\
+_{name}_complete() {{
+    local IFS=$'\\n'
+    COMPREPLY=( $({hook} "${{COMP_WORDS[@]:1:$COMP_CWORD}}") )
+}}
+complete -o default -F _{name}_complete {name}
+""",
+    'zsh': """\
+_{name}_complete() {{
+    local -a candidates
+    candidates=( ${{(f)"$({hook} "${{(@)words[2,$CURRENT]}}")"}} )
+    compadd -a candidates
+}}
+compdef _{name}_complete {name}
+""",
+    'fish': """\
+complete -c {name} -f -a '({hook} (commandline -opc)[2..-1] (commandline -ct))'
+""",
+}
+
+
+def source_file(obj):
+    path = getattr(sys.modules.get(getattr(obj, '__module__', None)), '__file__', None)
+    if path is None:
+        return None
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return os.path.abspath(path)
+
+
+def build_index(cli, regenerate=None):
+    """
+    Walks the cli's registered commands and handlers into a plain dict of
+    the names that can be completed at each level
+    """
+    from .handler import HandlerMarker
+    from .usage import usage_cache
+    sources = set([source_file(cli.__class__)])
+
+    def option_names(key, doc):
+        return sorted(o.long or o.short for o in usage_cache.get(key, doc).options)
+
+    def walk(target):
+        commands = {}
+        for name in target.commands:
+            command = target.load_command(name)
+            if isinstance(command, HandlerMarker):
+                sources.add(source_file(command.__class__))
+                commands[name] = walk(command)
+            else:
+                sources.add(source_file(command))
+                commands[name] = {'options': option_names(command, command.__autodoc__)}
+        return {'commands': commands,
+                'options': option_names(target.__class__, target.__autodoc__)}
+
+    index = walk(cli)
+    sources.discard(None)
+    index['sources'] = dict((path, os.path.getmtime(path)) for path in sources
+                            if os.path.exists(path))
+    index['regenerate'] = regenerate
+    return index
+
+
+def write_index(cli, path, regenerate=None):
+    index = build_index(cli, regenerate)
+    tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(index, f, sort_keys=True)
+    os.rename(tmp, path)
+    return index
+
+
+def completion_script(shell, name, index_path):
+    try:
+        script = SCRIPTS[shell]
+    except KeyError:
+        raise ValueError('completion is available for {0}, not "{1}"'.format(
+            ', '.join(sorted(SCRIPTS)), shell))
+    hook = ' '.join(quote(a) for a in
+                    [sys.executable, '-m', 'battalion.completion', index_path])
+    return script.format(name=name, hook=hook)
+
+
+def is_stale(index):
+    for path, mtime in index.get('sources', {}).items():
+        try:
+            if os.path.getmtime(path) != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def load_index(path):
+    with open(path) as f:
+        index = json.load(f)
+    if index.get('regenerate') and is_stale(index):
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(index['regenerate'], stdout=devnull, stderr=devnull)
+        with open(path) as f:
+            index = json.load(f)
+    return index
+
+
+def complete(index, words):
+    """
+    Returns the candidates for the last of words, the words typed so far
+    after the program name
+    """
+    words = list(words) or ['']
+    current = words.pop()
+    node = index
+    for word in words:
+        command = node['commands'].get(word)
+        if command is not None:
+            node = command
+            if 'commands' not in node:
+                break
+    candidates = sorted(node.get('commands', ())) + node['options']
+    return [c for c in candidates if c.startswith(current)]
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        print >> sys.stderr, 'Usage: python -m battalion.completion INDEX [<words>...]'
+        sys.exit(2)
+    try:
+        index = load_index(argv[0])
+    except (IOError, ValueError):
+        sys.exit(1)
+    for candidate in complete(index, argv[1:]):
+        print candidate
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from __future__ import absolute_import
+import os
+import logging
+from .dotify import DotifyDict
+from .utils import cleanup_data
+
+
+LOG = logging.getLogger(__name__)
+
+
+def load_yaml(path, Loader=None):
+    # yaml is only needed once there is a config file to read
+    import yaml
+    if Loader is None:
+        Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(path, 'r') as ymlfile:
+        return yaml.load(ymlfile, Loader=Loader)
+
+
+class ConfigCache(object):
+    """
+    Parsed config files keyed by path, a file is only parsed again when its
+    mtime or size changes
+    """
+
+    def __init__(self, Loader=None):
+        self.Loader = Loader
+        self._configs = {}
+
+    def load(self, path):
+        """
+        Returns the cleaned up config from path or None if there is no file
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime, stat.st_size)
+        try:
+            cached_key, config = self._configs[path]
+        except KeyError:
+            cached_key = None
+        if cached_key != key:
+            LOG.debug('parsing config "%s"', path)
+            config = cleanup_data(DotifyDict(data=load_yaml(path, self.Loader)))
+            self._configs[path] = (key, config)
+        return config
+
+    def invalidate(self, path=None):
+        if path is None:
+            self._configs.clear()
+        else:
+            self._configs.pop(path, None)
+
+
+config_cache = ConfigCache()
@@ -0,0 +1,169 @@
+"""
+Serves a CLI from a warm process over a unix socket
+
+The server is started with ``mycli --serve=SOCKET`` and keeps the imports,
+registration, autodoc and config cache of the cli warm between requests.
+The client forwards its argv, environment and working directory and
+streams back stdout, stderr and the exit code. Output is sent as base64
+so binary formats such as ``--output=msgpack`` arrive unchanged:
+
+    python -m battalion.daemon SOCKET [<args>...]
+
+With ``--fork`` each request is run in a forked child of the warm process
+so nothing a command does can leak into the next request.
+"""
+from __future__ import absolute_import
+import os
+import sys
+import json
+import base64
+import socket
+import logging
+import SocketServer
+
+
+LOG = logging.getLogger(__name__)
+
+
+def send(wfile, message):
+    wfile.write(json.dumps(message) + '\n')
+    wfile.flush()
+
+
+def exit_code(e):
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print >> sys.stderr, e.code
+    return 1
+
+
+class ClientStream(object):
+    """
+    File like object that forwards everything written to it to the client
+    """
+
+    def __init__(self, wfile, name):
+        self.wfile = wfile
+        self.name = name
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        send(self.wfile, {'stream': self.name, 'data': base64.b64encode(data)})
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+def run_request(cli, request, wfile):
+    """
+    Runs one client request against the warm cli with the clients
+    environment, working directory and output streams, returns the
+    exit code
+    """
+    # imported here so the client only ever needs the standard library
+    from .utils import redirect_output
+    environ, cwd = dict(os.environ), os.getcwd()
+    os.environ.clear()
+    os.environ.update(request.get('env', {}))
+    try:
+        os.chdir(request.get('cwd', cwd))
+        cli._state.cwd = os.getcwd()
+        cli._state_layer = None
+        with redirect_output(ClientStream(wfile, 'stdout'), ClientStream(wfile, 'stderr')):
+            try:
+                cli.write_result(cli.execute(request['argv']))
+                return 0
+            except SystemExit as e:
+                return exit_code(e)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        os.chdir(cwd)
+
+
+class CLIRequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        LOG.debug('request %s', request['argv'])
+        send(self.wfile, {'exit': run_request(self.server.cli, request, self.wfile)})
+
+
+class CLIServer(SocketServer.UnixStreamServer):
+
+    def __init__(self, cli, path):
+        self.cli = cli
+        if os.path.exists(path):
+            os.unlink(path)
+        SocketServer.UnixStreamServer.__init__(self, path, CLIRequestHandler)
+
+
+class ForkingCLIServer(SocketServer.ForkingMixIn, CLIServer):
+    pass
+
+
+def make_server(cli, path, fork=False):
+    server_class = ForkingCLIServer if fork else CLIServer
+    return server_class(cli, path)
+
+
+def serve(cli, path, fork=False):
+    server = make_server(cli, path, fork)
+    LOG.info('serving %s on %s', cli.name, path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def client(path, argv, env=None, cwd=None, stdout=None, stderr=None):
+    """
+    Runs argv on the cli served at path and returns its exit code
+    """
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    try:
+        sockfile = sock.makefile('rw')
+        send(sockfile, {'argv': list(argv),
+                        'env': dict(os.environ if env is None else env),
+                        'cwd': cwd or os.getcwd()})
+        while True:
+            line = sockfile.readline()
+            if not line:
+                print >> stderr, 'Lost connection to {0}'.format(path)
+                return 1
+            message = json.loads(line)
+            if 'exit' in message:
+                return message['exit']
+            stream = stdout if message['stream'] == 'stdout' else stderr
+            stream.write(base64.b64decode(message['data']))
+            stream.flush()
+    finally:
+        sock.close()
+
+
+def client_main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        print >> sys.stderr, 'Usage: python -m battalion.daemon SOCKET [<args>...]'
+        sys.exit(2)
+    sys.exit(client(argv[0], argv[1:]))
+
+
+if __name__ == "__main__":
+    client_main()
@@ -1,4 +1,4 @@
-__all__ = ['NoSuchCommand']
+__all__ = ['NoSuchCommand', 'FixtureError', 'CommandTimeout', 'PlanError']
 
 
 class NoSuchCommand(ValueError):
@@ -6,3 +6,18 @@ class NoSuchCommand(ValueError):
         super(NoSuchCommand, self).__init__("No such command: %s" % command)
         self.command = command
         self.supercommand = supercommand
+
+
+class FixtureError(ValueError):
+    pass
+
+
+class CommandTimeout(RuntimeError):
+    def __init__(self, command, timeout):
+        super(CommandTimeout, self).__init__("{0} timed out after {1}s".format(command, timeout))
+        self.command = command
+        self.timeout = timeout
+
+
+class PlanError(ValueError):
+    pass
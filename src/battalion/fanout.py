@@ -0,0 +1,124 @@
+"""
+Runs one command over many argument sets
+
+``mycli --map FILE <command> [<args>...]`` reads one record per line of
+FILE, or stdin for ``-``, either a shell style command line or a JSON list
+of arguments as in battalion.batch, and runs the command once per record
+with the record's arguments after the ones given on the command line:
+
+    $ cat hosts
+    web1
+    web2 --force
+    $ mycli --map hosts --jobs 8 deploy --version=2
+
+The command is looked up, the config loaded and the state compiled once.
+The records are then run on ``--jobs`` forked worker processes, which
+start with the compiled state and keep their process scoped fixtures for
+every record they run, or with ``--threads`` on a thread pool for
+commands that mostly wait on I/O.
+
+One result is returned per record, in input order or with
+``--as-completed`` as they finish:
+
+    {"record": 1, "args": ["web1"], "status": "ok", "result": ...}
+
+A failed record, or one that cannot be parsed, has "status": "error" and
+its "error", the rest still run and the cli exits with 1 once they have
+all finished.
+"""
+from __future__ import absolute_import
+import sys
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import cPickle as pickle
+from .batch import read_batch, parse_line
+from .usage import usage_cache
+from .utils import is_stream
+
+
+def read_records(path):
+    if path == '-':
+        for record in read_batch(sys.stdin):
+            yield record
+        return
+    with open(path) as source:
+        for record in read_batch(source):
+            yield record
+
+
+def run_record(owner, command, args, number, line):
+    result = {'record': number, 'args': None, 'status': 'ok', 'result': None}
+    try:
+        record = result['args'] = parse_line(line)
+        kwargs = owner.parse_command_args(command, args + record)
+        rv = owner.invocation(command)(**kwargs)
+        # a stream cannot be sent back from a worker
+        result['result'] = list(rv) if is_stream(rv) else rv
+    except SystemExit as e:
+        # usage errors and commands that exit
+        if e.code:
+            result['status'] = 'error'
+            result['error'] = e.code if isinstance(e.code, str) else 'exit {0}'.format(e.code)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = '{0}: {1}'.format(type(e).__name__, e)
+    return result
+
+
+# workers are forked with the command already found so it never has to
+# be pickled, only the records and results cross between processes
+_worker = None
+
+
+def _run_record(item):
+    result = run_record(*(_worker + item))
+    try:
+        pickle.dumps(result['result'], pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        result['result'] = repr(result['result'])
+    return result
+
+
+def fan_out(owner, command, args, records, jobs=1, threads=False, ordered=True):
+    """
+    Yields the result of running command on owner for every record, see
+    the module docstring, exits with 1 after the last one if any failed
+    """
+    global _worker
+    # compiled before any worker starts so none of them has to
+    usage_cache.get(command, command.__autodoc__)
+    pool = None
+    if jobs <= 1:
+        results = (run_record(owner, command, args, number, record)
+                   for number, record in records)
+    elif threads:
+        # a pool of its own so stopping early can drop the queued records
+        pool = ThreadPool(jobs)
+        imap = pool.imap if ordered else pool.imap_unordered
+        results = imap(lambda item: run_record(owner, command, args, *item), records)
+    else:
+        _worker = (owner, command, args)
+        pool = multiprocessing.Pool(jobs)
+        imap = pool.imap if ordered else pool.imap_unordered
+        results = imap(_run_record, records)
+    failed = total = 0
+    finished = False
+    try:
+        for result in results:
+            total += 1
+            if result['status'] != 'ok':
+                failed += 1
+            yield result
+        finished = True
+    finally:
+        if pool is not None:
+            if finished:
+                pool.close()
+            else:
+                # stopped early, the remaining records are not wanted
+                pool.terminate()
+            pool.join()
+            _worker = None
+    if failed:
+        print >> sys.stderr, '{0} of {1} records failed'.format(failed, total)
+        sys.exit(1)
@@ -0,0 +1,120 @@
+from __future__ import absolute_import
+import sys
+import six
+from .exceptions import FixtureError
+from .pool import get_pool
+from .spec import get_spec
+
+
+# Ordered narrowest to widest, a fixture may only depend on fixtures whose
+# scope is at least as wide as its own
+SCOPES = ('invocation', 'cli-run', 'process')
+
+# taken straight from the compiled state rather than built, so a fixture
+# of any scope may ask for them
+BUILTINS = {'state': lambda state: state,
+            'cli': lambda state: state.cli}
+
+
+class FixtureDef(object):
+    """
+    A registered fixture function along with the scope its value is
+    memoized for
+    """
+    __slots__ = ('func', 'name', 'scope', 'argnames')
+
+    def __init__(self, func, name, scope='invocation'):
+        if scope not in SCOPES:
+            raise ValueError('fixture scope must be one of {0}, got "{1}"'.format(
+                ', '.join(SCOPES), scope))
+        self.func = func
+        self.name = name
+        self.scope = scope
+        self.argnames = get_spec(func).args
+
+    def __repr__(self):
+        return '<FixtureDef {0} scope={1}>'.format(self.name, self.scope)
+
+    def dependencies(self, fixtures):
+        return [a for a in self.argnames
+                if a not in BUILTINS and a != self.name and a in fixtures]
+
+    def execute(self, state, values):
+        # arguments named after a fixture get its value and the first
+        # argument otherwise gets the state, which is how fixtures were
+        # originally called
+        if not self.argnames:
+            return self.func(state)
+        kwargs = dict((a, values[a]) for a in self.dependencies(values))
+        for a in self.argnames:
+            if a in BUILTINS and a != self.name:
+                kwargs[a] = BUILTINS[a](state)
+        if self.argnames[0] not in kwargs:
+            kwargs[self.argnames[0]] = state
+        return self.func(**kwargs)
+
+
+def fixture_order(names, fixtures):
+    """
+    Returns the FixtureDefs needed to build the given fixture names,
+    dependencies first
+    """
+    order = []
+    done = set()
+    visiting = []
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise FixtureError('fixture dependency cycle: {0}'.format(
+                ' -> '.join(visiting[visiting.index(name):] + [name])))
+        fixture = fixtures[name]
+        visiting.append(name)
+        for dep in fixture.dependencies(fixtures):
+            if SCOPES.index(fixtures[dep].scope) < SCOPES.index(fixture.scope):
+                raise FixtureError('{0} fixture "{1}" cannot depend on {2} fixture "{3}"'.format(
+                    fixture.scope, name, fixtures[dep].scope, dep))
+            visit(dep)
+        visiting.pop()
+        done.add(name)
+        order.append(fixture)
+
+    for name in names:
+        visit(name)
+    return order
+
+
+def _execute(args):
+    fixture, state, values = args
+    try:
+        return fixture.execute(state, values), None
+    except Exception:
+        return None, sys.exc_info()
+
+
+def execute_concurrently(fixtures, state, values, workers, registered):
+    """
+    Builds the given fixtures, which must be in dependency order, on a
+    thread pool. Fixtures that do not depend on each other are built at the
+    same time, if several fail the error from the first in order is raised.
+    """
+    levels = []
+    level_of = {}
+    for fixture in fixtures:
+        deps = [level_of[d] for d in fixture.dependencies(registered) if d in level_of]
+        level = max(deps) + 1 if deps else 0
+        level_of[fixture.name] = level
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(fixture)
+    pool = get_pool('fixtures', workers)
+    for level in levels:
+        if len(level) == 1:
+            values[level[0].name] = level[0].execute(state, values)
+            continue
+        results = pool.map(_execute, [(f, state, values) for f in level])
+        for fixture, (value, exc_info) in zip(level, results):
+            if exc_info is not None:
+                six.reraise(*exc_info)
+            values[fixture.name] = value
@@ -0,0 +1,172 @@
+"""
+Writing command results
+
+``mycli --output=FORMAT <command>`` writes what the command returned as:
+
+ - text    | the value as printed, one line per item of a streamed value (the default)
+ - json    | one JSON document, a streamed value as a JSON array
+ - jsonl   | one JSON value per line, a line per item of a streamed value
+ - msgpack | msgpack values back to back, one per item of a streamed value
+
+A command returning None writes nothing. JSON is encoded with ujson when
+it is installed and the value holds only types it writes the way the
+json module does. Anything else goes to the json module, which writes an
+object it cannot encode as its repr, or the whole value as its repr when
+a key or bytes cannot be written. msgpack needs the msgpack package,
+``pip install battalion[output]`` installs both.
+
+Every format is encoded straight to bytes and written to the binary
+stdout in writes of about ``BUFFER`` bytes, see write.
+"""
+from __future__ import absolute_import
+import sys
+import json
+import time
+import errno
+import six
+from .utils import is_stream
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# encoded output is written once this much is gathered or this long has
+# passed since the last write, whichever comes first
+BUFFER = 64 * 1024
+INTERVAL = 0.1
+
+
+def encode_text(value, encoding):
+    if isinstance(value, six.text_type):
+        return value.encode(encoding, 'replace') + '\n'
+    return '{0}\n'.format(value)
+
+
+# types ujson writes the way json does, it writes any other object as the
+# dict of its attributes, dates as timestamps and turns any key to a string
+_PLAIN = frozenset(six.string_types + six.integer_types + (float, bool, type(None)))
+_KEYS = frozenset(six.string_types)
+_json = json.JSONEncoder(separators=(',', ':'), default=repr)
+
+
+def is_plain(value):
+    kind = type(value)
+    if kind is dict:
+        for key in value:
+            if type(key) not in _KEYS:
+                return False
+        values = six.itervalues(value)
+    elif kind is list or kind is tuple:
+        values = value
+    else:
+        return kind in _PLAIN
+    for v in values:
+        if type(v) not in _PLAIN and not is_plain(v):
+            return False
+    return True
+
+
+def encode_json(value):
+    if ujson is not None and is_plain(value):
+        try:
+            # ujson's defaults round floats to 10 digits and escape "/",
+            # these match what json writes without it
+            return ujson.dumps(value, double_precision=15, escape_forward_slashes=False)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    try:
+        return _json.encode(value)
+    except (TypeError, ValueError):
+        # keys json cannot write or bytes that are not utf-8
+        return _json.encode(repr(value))
+
+
+def text_records(rv, encoding):
+    if is_stream(rv):
+        for item in rv:
+            yield encode_text(item, encoding)
+    elif rv:
+        yield encode_text(rv, encoding)
+
+
+def json_records(rv, encoding):
+    if is_stream(rv):
+        yield '['
+        separator = ''
+        for item in rv:
+            yield separator + encode_json(item)
+            separator = ','
+        yield ']\n'
+    elif rv is not None:
+        yield encode_json(rv) + '\n'
+
+
+def jsonl_records(rv, encoding):
+    for item in (rv if is_stream(rv) else [rv] if rv is not None else []):
+        yield encode_json(item) + '\n'
+
+
+def msgpack_records(rv, encoding):
+    packer = msgpack.Packer(default=repr, use_bin_type=False)
+    for item in (rv if is_stream(rv) else [rv] if rv is not None else []):
+        yield packer.pack(item)
+
+
+FORMATS = {'text': text_records,
+           'json': json_records,
+           'jsonl': jsonl_records,
+           'msgpack': msgpack_records}
+
+
+def check_format(format):
+    """
+    Returns an error message if format cannot be written, otherwise None
+    """
+    if format not in FORMATS:
+        return '--output must be one of {0}, got "{1}"'.format(
+            ', '.join(sorted(FORMATS)), format)
+    if format == 'msgpack' and msgpack is None:
+        return '--output=msgpack needs the msgpack package installed'
+
+
+def write(rv, format='text', stream=None, buffer_size=BUFFER, interval=INTERVAL):
+    """
+    Writes a command's return value to stream, stdout by default
+
+    A streamed return value is written as it is produced, in writes of
+    about buffer_size bytes, or whatever has been gathered after interval
+    seconds, so that only that much is held at once. A blocking write
+    holds back the producer until the reader catches up, and a reader
+    going away, as with ``| head``, stops the stream quietly.
+    """
+    stream = stream or sys.stdout
+    encoding = getattr(stream, 'encoding', None) or 'utf-8'
+    # text streams wrap the binary stream as their buffer
+    out = getattr(stream, 'buffer', stream)
+    chunk, size, written = [], 0, time.time()
+    try:
+        try:
+            for record in FORMATS[format](rv, encoding):
+                chunk.append(record)
+                size += len(record)
+                if size >= buffer_size or time.time() - written >= interval:
+                    out.write(''.join(chunk))
+                    out.flush()
+                    chunk, size, written = [], 0, time.time()
+        finally:
+            # what was produced before a failure is still written out
+            if chunk:
+                out.write(''.join(chunk))
+                out.flush()
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+        if is_stream(rv) and hasattr(rv, 'close'):
+            rv.close()
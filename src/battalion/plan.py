@@ -0,0 +1,321 @@
+"""
+Plans recorded by dry runs and replayed later
+
+While ``state.dryrun`` is on, every call made through ``dryrun`` is added
+to the current plan as an Action instead of being run. Actions replay in
+the order they were called unless wrapped with ``independent=True``, then
+an action only waits for the earlier actions whose dry run values it was
+passed.
+
+A dry run value passed on to a later action, as it is or inside a list or
+dict, is recorded as a reference and swapped for the real result of the
+action that returned it on replay. Strings are handed back as a copy of
+their own so an equal string elsewhere is not taken for them. None,
+bools, numbers and values derived from a dry run value, such as
+``value + '/x'``, cannot be told apart and are replayed as recorded.
+
+``mycli --plan=FILE <command>`` dry runs the command and saves its plan,
+``mycli --apply-plan=FILE --jobs=N`` replays it with the exact arguments
+that were reviewed, running actions that do not depend on each other on
+up to N threads.
+"""
+from __future__ import absolute_import
+import sys
+import json
+import threading
+from importlib import import_module
+import six
+from .exceptions import PlanError
+from .pool import get_pool
+
+
+# values too common to tell which action produced them
+_UNTRACKED = (type(None), bool, int, long, float)
+
+
+class _StrResult(str):
+    __slots__ = ()
+
+
+class _UnicodeResult(unicode):
+    __slots__ = ()
+
+
+def stand_in(value):
+    """
+    Returns the dry run value an action hands back, strings are copied so
+    passing this one on can be told apart from any equal string
+    """
+    if isinstance(value, str):
+        return _StrResult(value)
+    if isinstance(value, unicode):
+        return _UnicodeResult(value)
+    return value
+
+
+class ResultOf(object):
+    """
+    Stands in a recorded argument for the result of an earlier action
+    """
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __repr__(self):
+        return '<result of {0}>'.format(self.index)
+
+    def __eq__(self, other):
+        return isinstance(other, ResultOf) and other.index == self.index
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def encode_arg(value):
+    if isinstance(value, ResultOf):
+        return {'$result': value.index}
+    if isinstance(value, (list, tuple)):
+        return [encode_arg(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, encode_arg(v)) for k, v in value.items())
+    return value
+
+
+def decode_arg(value):
+    if isinstance(value, list):
+        return [decode_arg(v) for v in value]
+    if isinstance(value, dict):
+        if len(value) == 1 and '$result' in value:
+            return ResultOf(value['$result'])
+        return dict((k, decode_arg(v)) for k, v in value.items())
+    return value
+
+
+def replace_results(value, results):
+    if isinstance(value, ResultOf):
+        return results[value.index]
+    if isinstance(value, list):
+        return [replace_results(v, results) for v in value]
+    if isinstance(value, dict):
+        return dict((k, replace_results(v, results)) for k, v in value.items())
+    return value
+
+
+class Action(object):
+    __slots__ = ('index', 'target', 'args', 'kwargs', 'depends')
+
+    def __init__(self, index, target, args, kwargs, depends):
+        self.index = index
+        self.target = target
+        self.args = list(args)
+        self.kwargs = dict(kwargs)
+        self.depends = sorted(depends)
+
+    def __repr__(self):
+        return '<Action {0} {1}>'.format(self.index, self)
+
+    def __str__(self):
+        name = self.target.get('callable') or '.'.join(
+            n for n in (self.target.get('handler'), self.target['command']) if n)
+        args = [repr(a) for a in self.args]
+        args += ['{0}={1!r}'.format(k, v) for k, v in sorted(self.kwargs.items())]
+        return '{0}({1})'.format(name, ', '.join(args))
+
+    def to_dict(self):
+        return {'index': self.index, 'target': self.target, 'args': encode_arg(self.args),
+                'kwargs': encode_arg(self.kwargs), 'depends': self.depends}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['index'], data['target'], decode_arg(data['args']),
+                   decode_arg(data['kwargs']), data['depends'])
+
+    def resolve(self, cli):
+        if 'callable' in self.target:
+            module_name, _, attr = self.target['callable'].partition(':')
+            try:
+                obj = import_module(module_name)
+                for part in attr.split('.'):
+                    obj = getattr(obj, part)
+            except (ImportError, AttributeError):
+                raise PlanError('cannot find {0} to replay action {1}'.format(
+                    self.target['callable'], self.index))
+            return obj
+        owner = cli
+        if self.target.get('handler'):
+            for name in self.target['handler'].split('.'):
+                owner = owner.load_command(name)
+        return owner.invocation(owner.load_command(self.target['command']))
+
+    def run(self, cli, results):
+        """
+        Runs the action with the results of the earlier actions in place
+        of their dry run values
+        """
+        return self.resolve(cli)(*replace_results(self.args, results),
+                                 **replace_results(self.kwargs, results))
+
+
+def target_of(f):
+    """
+    Describes a wrapped callable in a way that can be found again on replay
+    """
+    from .utils import CommandInvocation
+    from .handler import HandlerMarker
+    if isinstance(f, CommandInvocation):
+        owner = f.owner
+        return {'command': f.command.__name__,
+                'handler': owner.path if isinstance(owner, HandlerMarker) else None}
+    module = getattr(f, '__module__', None)
+    name = getattr(f, '__name__', None)
+    if module is None or name is None:
+        raise PlanError('{0!r} cannot be recorded in a plan'.format(f))
+    return {'callable': '{0}:{1}'.format(module, name)}
+
+
+class Plan(object):
+    """
+    The actions a dry run would have performed, in the order it called them
+    """
+
+    def __init__(self, actions=None):
+        self.actions = list(actions or [])
+        self._lock = threading.Lock()
+        # id of a dry run value -> the action that returned it, the values
+        # are kept alongside so their ids cannot be reused while recording
+        self._produced = {}
+        # the last action kept in call order and the independent ones
+        # recorded since, a new ordered action waits for all of them
+        self._ordered = None
+        self._independent = []
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __iter__(self):
+        return iter(self.actions)
+
+    def record(self, f, args, kwargs, value=None, independent=False):
+        """
+        Adds a call to the plan, returns the value the dry run hands back
+        in place of its result
+        """
+        with self._lock:
+            index = len(self.actions)
+            depends = set()
+            args = self._link(list(args), depends)
+            kwargs = self._link(dict(kwargs), depends)
+            if independent:
+                self._independent.append(index)
+            else:
+                # waiting on these waits on every earlier action
+                depends.update(self._independent)
+                if self._ordered is not None:
+                    depends.add(self._ordered)
+                self._ordered = index
+                self._independent = []
+            self.actions.append(Action(index, target_of(f), args, kwargs, depends))
+            value = stand_in(value)
+            if not isinstance(value, _UNTRACKED):
+                self._produced.setdefault(id(value), (index, value))
+            return value
+
+    def _link(self, value, depends):
+        """
+        Replaces the dry run values in value with references to the actions
+        that returned them, adding those actions to depends
+        """
+        if isinstance(value, _UNTRACKED):
+            return value
+        produced = self._produced.get(id(value))
+        if produced is not None:
+            depends.add(produced[0])
+            return ResultOf(produced[0])
+        if isinstance(value, (list, tuple)):
+            return [self._link(v, depends) for v in value]
+        if isinstance(value, dict):
+            return dict((k, self._link(v, depends)) for k, v in value.items())
+        return value
+
+    def levels(self):
+        """
+        Groups the actions so every action comes after all it depends on,
+        the actions in one level are independent of each other
+        """
+        levels = []
+        level_of = {}
+        for action in self.actions:
+            level = max([level_of[d] + 1 for d in action.depends] or [0])
+            level_of[action.index] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(action)
+        return levels
+
+    def execute(self, cli, workers=1):
+        """
+        Replays the plan on cli, returns the results in action order. If an
+        action fails the rest of its level finishes, the error of the first
+        failed action is raised and no later level is started.
+        """
+        results = [None] * len(self.actions)
+        pool = get_pool('plan', workers) if workers > 1 else None
+        for level in self.levels():
+            if pool is None or len(level) == 1:
+                for action in level:
+                    results[action.index] = action.run(cli, results)
+                continue
+            outcomes = pool.map(lambda action: _run(action, cli, results), level)
+            for action, (value, exc_info) in zip(level, outcomes):
+                if exc_info is not None:
+                    six.reraise(*exc_info)
+                results[action.index] = value
+        return results
+
+    def to_dict(self):
+        return {'version': 1, 'actions': [a.to_dict() for a in self.actions]}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != 1:
+            raise PlanError('unsupported plan version {0}'.format(data.get('version')))
+        return cls(Action.from_dict(a) for a in data['actions'])
+
+    def dump(self, path):
+        try:
+            data = json.dumps(self.to_dict(), indent=2, sort_keys=True)
+        except TypeError as e:
+            raise PlanError('plan arguments must be JSON values: {0}'.format(e))
+        with open(path, 'w') as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _run(action, cli, results):
+    try:
+        return action.run(cli, results), None
+    except Exception:
+        return None, sys.exc_info()
+
+
+_current = None
+
+
+def current_plan():
+    """
+    Returns the plan dry runs are being recorded into
+    """
+    global _current
+    if _current is None:
+        _current = Plan()
+    return _current
+
+
+def reset():
+    global _current
+    _current = None
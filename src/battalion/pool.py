@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+import sys
+import threading
+import six
+
+
+_pools = {}
+
+
+def get_pool(name, workers):
+    """
+    Returns the shared thread pool for name, pools are created the first
+    time they are asked for and kept for the life of the process. Asking
+    for a different number of workers replaces the pool, the old one
+    finishes what it was given and its threads exit.
+    """
+    try:
+        size, pool = _pools[name]
+    except KeyError:
+        size = pool = None
+    if size != workers:
+        from multiprocessing.pool import ThreadPool
+        if pool is not None:
+            pool.close()
+        pool = ThreadPool(workers)
+        _pools[name] = (workers, pool)
+    return pool
+
+
+class ThreadResult(object):
+    """
+    Runs func on a thread of its own, get() works like AsyncResult.get
+    """
+
+    def __init__(self, func, args=(), kwargs=None):
+        self._value = self._error = None
+        self._thread = threading.Thread(target=self._run, args=(func, args, kwargs or {}))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args, kwargs):
+        try:
+            self._value = func(*args, **kwargs)
+        except BaseException:
+            self._error = sys.exc_info()
+
+    def ready(self):
+        return not self._thread.is_alive()
+
+    def get(self, timeout=None):
+        from multiprocessing import TimeoutError
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError
+        if self._error is not None:
+            six.reraise(*self._error)
+        return self._value
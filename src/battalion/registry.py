@@ -1,84 +1,274 @@
 import logging
-import types
+import six
 from functools import wraps
+from importlib import import_module
 from inspect import isclass
+from .spec import get_spec
+from .cache import CachePolicy
+from .fixtures import FixtureDef, fixture_order, execute_concurrently
 
 
 LOG = logging.getLogger(__name__)
 
 
-def copy_func(f, name=None):
-    return types.FunctionType(f.func_code, f.func_globals, name or f.func_name,
-        f.func_defaults, f.func_closure)
+class CommandAlias(object):
+    # A command function as registered under one name for one cli or
+    # handler. It shares the function and its spec, and only carries the
+    # name and the usage autodoc generates for it, so the usage line shows
+    # the name and each owner keeps its own help without touching the
+    # function.
+    __slots__ = ('func', '__name__', '__autodoc__')
+
+    def __init__(self, func, name):
+        self.func = func
+        self.__name__ = name
+        get_spec(func)
+
+    def __repr__(self):
+        return '<CommandAlias {0} of {1}>'.format(self.__name__, self.func.__name__)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    @property
+    def __doc__(self):
+        return self.func.__doc__
+
+    # found on the class before __getattr__ is tried, so forwarded here for
+    # completion and the result cache to see the function's module
+    @property
+    def __module__(self):
+        return self.func.__module__
+
+    @property
+    def __wrapped__(self):
+        return self.func
+
+    def __getattr__(self, attr):
+        # the spec, code and the rest come from the function, the usage
+        # must not or the alias would be taken as already documented
+        if attr == '__autodoc__':
+            raise AttributeError(attr)
+        return getattr(self.func, attr)
+
+
+class LazyCommand(object):
+    # Placeholder for a command or handler bound by import path, the target
+    # module is only imported when the command is loaded
+    __slots__ = ('path', 'names', 'doc')
+
+    def __init__(self, path, names, doc=None):
+        self.path = path
+        self.names = names
+        self.doc = doc
+
+    def __repr__(self):
+        return '<LazyCommand {0}>'.format(self.path)
+
+    @property
+    def __doc__(self):
+        return self.doc
+
+    def load(self):
+        module_name, _, attr = self.path.partition(':')
+        obj = import_module(module_name)
+        for part in attr.split('.'):
+            obj = getattr(obj, part)
+        return obj
+
+
+def command_key(cli, handler=None):
+    """
+    Returns the registry key for a cli, or for a handler beneath it given
+    as a dotted path ("cloud.compute") or a sequence of handler names
+    """
+    if not handler:
+        return (cli,)
+    if isinstance(handler, six.string_types):
+        handler = handler.split('.')
+    return (cli,) + tuple(handler)
+
+
+class CommandNode(object):
+    """
+    One segment of a command path, holding the commands registered at it
+    and the nodes for the handlers beneath it
+    """
+    __slots__ = ('commands', 'children')
+
+    def __init__(self):
+        self.commands = {}
+        self.children = {}
 
 
 class Registry(object):
 
     def __init__(self):
-        self._registry = {}
-        self._cache = []
+        # a trie over the segments of the command keys, so finding the
+        # commands of a key costs one step per segment however many
+        # commands are registered
+        self._root = CommandNode()
+        # keyed by id() so any attribute value can be checked, the value
+        # keeps the object alive so its id is never reused
+        self._cache = {}
         self._aliases = {}
+        self._func_aliases = {}
         self._fixtures = {}
+        self._fixture_order = {}
+        self._fixture_cache = {'cli-run': {}, 'process': {}}
+        self.fixture_names = frozenset()
+
+    def _node(self, key, create=False):
+        node = self._root
+        for segment in key:
+            try:
+                node = node.children[segment]
+            except KeyError:
+                if not create:
+                    return None
+                child = node.children[segment] = CommandNode()
+                node = child
+        return node
 
     def get_commands(self, key):
-        try:
-            commands = self._registry[key]
-        except KeyError:
-            commands = {}
-        return commands
+        node = self._node(key)
+        if node is None:
+            return {}
+        return node.commands
 
     def is_cached(self, func):
-        return func in self._cache
+        return id(func) in self._cache
+
+    def get_aliases(self, func):
+        return self._func_aliases.get(id(func), [])
 
     def _register(self, key, func, name):
         LOG.debug('registering "%s" to "%s"', name, key)
-        commands = self.get_commands(key)
-        if name in commands.keys():
+        commands = self._node(key, create=True).commands
+        if name in commands and not isinstance(commands[name], LazyCommand):
             raise ValueError("{0} already registered to {1}".format(name, key))
         if isclass(func):
             commands[name] = func
         else:
-            # we copy the function so alias will show the proper usage line with the alias name
-            commands[name] = copy_func(func, name)
-        self._registry[key] = commands
+            commands[name] = CommandAlias(func, name)
+
+    def _cache_alias(self, alias, func):
+        previous = self._aliases.get(alias)
+        if previous is not None:
+            self._func_aliases[id(previous)].remove(alias)
+        self._aliases[alias] = func
+        self._func_aliases.setdefault(id(func), []).append(alias)
 
     def register(self, func, name, key=None, aliases=[]):
-        if func not in self._cache:
+        if id(func) not in self._cache:
             LOG.debug('caching command "%s"', name)
-            self._cache.append(func)
+            self._cache[id(func)] = func
+            if not isclass(func):
+                get_spec(func)
         if any(key):
             self._register(key, func, name)
             for alias in aliases:
                 self._register(key, func, alias)
-            for alias in [a for a, f in self._aliases.items() if f is func]:
+            for alias in self.get_aliases(func):
                 self._register(key, func, alias)
         else:
             for alias in aliases:
                 LOG.debug('caching alias "%s" for command "%s"', alias, name)
-                self._aliases[alias] = func
+                self._cache_alias(alias, func)
 
     def bind(self, func, cli, handler=None, aliases=[]):
-        if handler:
-            key = (cli, handler)
-        else:
-            key = (cli,)
-        self.register(func, func.__name__, key, aliases)
+        self.register(func, func.__name__, command_key(cli, handler), aliases)
+
+    def bind_lazy(self, path, cli, handler=None, name=None, aliases=[], doc=None):
+        """
+        Bind the command or handler found at "package.module:attr" without
+        importing it, doc is used for the command listing until it is loaded
+        """
+        key = command_key(cli, handler)
+        name = name or path.rpartition(':')[2].rpartition('.')[2]
+        lazy = LazyCommand(path, [name] + list(aliases), doc)
+        commands = self._node(key, create=True).commands
+        for n in lazy.names:
+            LOG.debug('registering lazy "%s" to "%s"', n, key)
+            if n in commands:
+                raise ValueError("{0} already registered to {1}".format(n, key))
+            commands[n] = lazy
+
+    def load(self, key, name):
+        """
+        Returns the command registered as name, importing it first if it
+        was bound lazily
+        """
+        commands = self.get_commands(key)
+        lazy = commands[name]
+        if not isinstance(lazy, LazyCommand):
+            return lazy
+        LOG.debug('loading "%s" for "%s"', lazy.path, key)
+        func = lazy.load()
+        # importing may already have registered it through the decorators
+        # so only fill the names that are still placeholders
+        for n in lazy.names:
+            if commands.get(n) is lazy:
+                self._register(key, func, n)
+        return commands[name]
 
     def get_fixture(self, key, state):
+        if key not in self._fixtures:
+            return None
+        return self.get_fixtures((key,), state)[key]
+
+    def get_fixtures(self, names, state, workers=0):
+        """
+        Returns a dict of fixture values for a tuple of fixture names,
+        building their dependencies first and reusing any value that is
+        still memoized for its scope
+
+        With more than one worker, fixtures that do not depend on each
+        other are built concurrently on a thread pool.
+        """
         try:
-            fixture = self._fixtures[key]
+            order = self._fixture_order[names]
         except KeyError:
-            return None
-        return fixture(state)
+            order = self._fixture_order[names] = fixture_order(names, self._fixtures)
+        values = {}
+        # walk back from the requested fixtures so the dependencies of a
+        # memoized fixture are not built for nothing
+        needed = set(names)
+        for fixture in reversed(order):
+            if fixture.name not in needed:
+                continue
+            cache = self._fixture_cache.get(fixture.scope)
+            if cache is not None and fixture.name in cache:
+                values[fixture.name] = cache[fixture.name]
+            else:
+                needed.update(fixture.dependencies(self._fixtures))
+        build = [f for f in order if f.name in needed and f.name not in values]
+        if workers > 1 and len(build) > 1:
+            execute_concurrently(build, state, values, workers, self._fixtures)
+        else:
+            for fixture in build:
+                values[fixture.name] = fixture.execute(state, values)
+        for fixture in build:
+            if fixture.scope in self._fixture_cache:
+                self._fixture_cache[fixture.scope][fixture.name] = values[fixture.name]
+        return dict((name, values[name]) for name in names)
+
+    def reset_fixtures(self, scope):
+        """
+        Drops the memoized values of every fixture of the given scope
+        """
+        self._fixture_cache[scope].clear()
 
     def is_fixture(self, key):
-        return key in self._fixtures.keys()
+        return key in self._fixtures
 
-    def register_fixture(self, func, name):
+    def register_fixture(self, func, name, scope='invocation'):
         LOG.debug('registering fixture "%s"', name)
-        if name in self._fixtures.keys():
+        if name in self._fixtures:
             raise ValueError("{0} already a registered fixture".format(name))
-        self._fixtures[name] = func
+        self._fixtures[name] = FixtureDef(func, name, scope)
+        self._fixture_order.clear()
+        self.fixture_names = frozenset(self._fixtures)
 
 
 registry = Registry()
@@ -92,10 +282,12 @@ class HandlerRegistrationMixin(type):
                 passthrough[k] = v        
         newclass = super(HandlerRegistrationMixin, cls).__new__(cls, clsname, bases, passthrough)
         if hasattr(newclass.State, 'cli') and newclass.State.cli is not None and newclass.State.cli != "self":
-            registry.register(newclass, clsname, (newclass.State.cli,))
+            # State.parent places the handler beneath another handler
+            key = command_key(newclass.State.cli, getattr(newclass.State, 'parent', None))
+            registry.register(newclass, clsname, key)
             for k, v in attrs.items():
                 if registry.is_cached(v):
-                    registry.register(v, k, (newclass.State.cli, clsname))
+                    registry.register(v, k, key + (clsname,))
         return newclass
 
 
@@ -120,7 +312,16 @@ class CLIRegistrationMixin(type):
 
 def command(*args, **kwargs):
     """
-    Decorator that can expose a function as a command for a cli or handler
+    Decorator that can expose a function as a command for a cli or handler,
+    handler may be a dotted path to a nested handler
+
+    timeout=<seconds> makes callers give up waiting on the command and
+    raise CommandTimeout, the command itself runs on to completion.
+
+    cache=True stores the command's results on disk and reuses them for
+    the same arguments and state, cache=<seconds> expires them after that
+    long and cache_state=[names] limits the state they depend on, see
+    battalion.cache.
     """
     invoked = bool(not args or kwargs)
     if not invoked:
@@ -128,12 +329,7 @@ def command(*args, **kwargs):
 
     def register(func):
         name = func.__name__
-        cli = kwargs.get('cli', None)
-        handler = kwargs.get('handler', None)
-        if handler:
-            key = (cli, handler)
-        else:
-            key = (cli,)
+        key = command_key(kwargs.get('cli', None), kwargs.get('handler', None))
         aliases = kwargs.get('aliases', [])
         if not isinstance(aliases, list):
             raise ValueError('command decorator aliases takes a list, '
@@ -144,6 +340,12 @@ def command(*args, **kwargs):
         else:
             aliases += [alias]
         registry.register(func, name, key, aliases)
+        if 'timeout' in kwargs:
+            get_spec(func).timeout = kwargs['timeout']
+        cache = kwargs.get('cache')
+        if cache:
+            get_spec(func).cache = CachePolicy(None if cache is True else cache,
+                                               kwargs.get('cache_state'))
         return func
     return register if invoked else register(func)
 
@@ -168,29 +370,25 @@ def doublewrap(f):
 
 
 @doublewrap
-def fixture(func, memoize=False):
+def fixture(func, scope=None, memoize=False):
     """
     Decorator for a function that will be called ahead of the execution
     of a command that provides a return value to fill the commands
     argument with
 
-    Fixtures memoize their results by default.
+    A fixture's arguments are filled by the fixtures of the same name, the
+    first argument is otherwise given the state.
+
+    The scope controls how long the value is memoized for:
+     - invocation | rebuilt for every command invocation (the default)
+     - cli-run | built once per run of the cli, shared by nested commands
+     - process | built once for the life of the process
+    memoize=True is the same as scope="process".
     """
-    @wraps(func)
-    def wrap(*args, **kwargs):
-        cache = func.cache  # attributed added by memoize
-        if func in cache:
-            return cache[func]
-        else:
-            cache[func] = result = func(*args, **kwargs)
-            return result
-    if memoize:
-        func.cache = {}
-        new_func = wrap
-    else:
-        new_func = func
-    registry.register_fixture(new_func, func.__name__)
-    return new_func
+    if scope is None:
+        scope = 'process' if memoize else 'invocation'
+    registry.register_fixture(func, func.__name__, scope)
+    return func
 
 @fixture
 def cli(state):
@@ -198,4 +396,4 @@ def cli(state):
 
 @fixture
 def state(state):
-    return state
\ No newline at end of file
+    return state
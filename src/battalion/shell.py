@@ -0,0 +1,120 @@
+"""
+Interactive shell for a CLI, started with ``mycli --shell``
+
+Every line is run on the same cli instance so compiled usage patterns, the
+loaded config and process scoped fixtures are reused between lines. TAB
+completes command, alias and option names from the registry and history
+is kept in ``~/.<cli name>_history`` when readline is available.
+"""
+from __future__ import absolute_import
+import os
+import cmd
+import shlex
+from .autodoc import AutoDocCommand
+from .handler import HandlerMarker
+from .usage import usage_cache
+
+try:
+    import readline
+except ImportError:
+    readline = None
+
+
+class Shell(cmd.Cmd):
+
+    def __init__(self, cli, history=None, stdin=None, stdout=None):
+        cmd.Cmd.__init__(self, stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            self.use_rawinput = False
+        self.cli = cli
+        self.prompt = '{0}> '.format(cli.name)
+        if history is None:
+            history = os.path.expanduser('~/.{0}_history'.format(cli.name))
+        self.history = history
+        self.exit_code = 0
+
+    def run(self):
+        if readline is not None:
+            # options start with - which readline splits words on by default
+            readline.set_completer_delims(' \t\n')
+            try:
+                readline.read_history_file(self.history)
+            except IOError:
+                pass
+        try:
+            while True:
+                try:
+                    return self.cmdloop()
+                except KeyboardInterrupt:
+                    self.stdout.write('^C\n')
+        finally:
+            if readline is not None:
+                try:
+                    readline.write_history_file(self.history)
+                except IOError:
+                    pass
+
+    def onecmd(self, line):
+        # commands always win over the shells own exit and help
+        name, arg, line = self.parseline(line)
+        if name in self.cli.commands:
+            return self.default(line)
+        return cmd.Cmd.onecmd(self, line)
+
+    def emptyline(self):
+        pass
+
+    def default(self, line):
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            self.stdout.write('{0}\n'.format(e))
+            return
+        try:
+            self.cli.write_result(self.cli.execute(argv))
+            self.exit_code = 0
+        except SystemExit as e:
+            self.exit_code = e.code
+
+    def do_help(self, arg):
+        """Shows the help for the cli or the given command"""
+        self.default(arg + ' --help')
+
+    def do_exit(self, arg):
+        """Leaves the shell"""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        self.stdout.write('\n')
+        return True
+
+    def candidates(self, words):
+        """
+        Returns the command and option names that may follow the given words
+        """
+        target = self.cli
+        for word in words:
+            command = target.commands.get(word)
+            if isinstance(command, HandlerMarker):
+                target = command
+            elif command is not None:
+                return self.option_names(target.load_command(word))
+        return sorted(target.commands) + self.option_names(target)
+
+    def option_names(self, owner):
+        # the same pattern dispatch compiles, so completing never reparses
+        key = owner.__class__ if isinstance(owner, AutoDocCommand) else owner
+        options = usage_cache.get(key, owner.__autodoc__).options
+        return sorted(o.long or o.short for o in options)
+
+    def completenames(self, text, *ignored):
+        return [c for c in self.candidates([]) if c.startswith(text)]
+
+    def completedefault(self, text, line, begidx, endidx):
+        try:
+            words = shlex.split(line[:begidx])
+        except ValueError:
+            return []
+        return [c for c in self.candidates(words) if c.startswith(text)]
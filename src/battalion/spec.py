@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+from inspect import getargspec
+
+
+class CommandSpec(object):
+    """
+    Signature metadata for a command, computed once when the command is
+    registered so dispatch and autodoc never have to introspect it again
+    """
+    __slots__ = ('args', 'callargs', 'option_keys', 'timeout', 'cache',
+                 '_fixture_names', '_fixture_args', '_command_args', '_command_kwargs')
+
+    def __init__(self, func):
+        spec = getargspec(func)
+        defaults = spec.defaults or ()
+        positional = len(spec.args) - len(defaults)
+        self.args = tuple(spec.args)
+        # the same mapping getcallargs returns when positionals are given None
+        self.callargs = dict.fromkeys(spec.args[:positional])
+        self.callargs.update(zip(spec.args[positional:], defaults))
+        if spec.varargs:
+            self.callargs[spec.varargs] = ()
+        if spec.keywords:
+            self.callargs[spec.keywords] = {}
+        # only commands that get dispatched need one
+        self.option_keys = None
+        self.timeout = None
+        self.cache = None
+        self._fixture_names = None
+
+    def _resolve(self, fixture_names):
+        # fixture_names is an immutable snapshot from the registry so an
+        # identity check is enough to know if fixtures have changed
+        if fixture_names is not self._fixture_names:
+            self._fixture_args = tuple(sorted(a for a in self.callargs
+                                              if a in fixture_names))
+            self._command_args = tuple(a for a in self.args
+                                       if a not in fixture_names and a != 'cli')
+            self._command_kwargs = dict((k, v) for k, v in self.callargs.items()
+                                        if k not in fixture_names)
+            self._fixture_names = fixture_names
+
+    def fixture_args(self, fixture_names):
+        self._resolve(fixture_names)
+        return self._fixture_args
+
+    def command_args(self, fixture_names):
+        self._resolve(fixture_names)
+        return self._command_args
+
+    def command_kwargs(self, fixture_names):
+        self._resolve(fixture_names)
+        return self._command_kwargs
+
+    def option_key(self, key):
+        if self.option_keys is None:
+            self.option_keys = {}
+        try:
+            return self.option_keys[key]
+        except KeyError:
+            pass
+        name = key
+        if name.startswith('--'):
+            name = name[2:]
+        if name.startswith('-'):
+            name = name[1:]
+        name = name.replace('-', '_')
+        name = name.replace('<', '')
+        name = name.replace('>', '')
+        self.option_keys[key] = name
+        return name
+
+
+def get_spec(func):
+    try:
+        return func.__command_spec__
+    except AttributeError:
+        spec = func.__command_spec__ = CommandSpec(func)
+        return spec
@@ -1,4 +1,53 @@
-from pyul.coreUtils import DotifyDict
+from __future__ import absolute_import
+from .dotify import DotifyDict
+
+
+_MISSING = object()
+
+
+def merge_values(values):
+    """
+    Merges the values a key has in several layers, lowest precedence first,
+    the way DotifyDict.update would but without changing any of them
+    """
+    value = values[0]
+    for other in values[1:]:
+        if isinstance(other, dict) and isinstance(value, dict):
+            value = merge_layers([value, other])
+        elif isinstance(other, list) and isinstance(value, list):
+            value = value + other
+        elif isinstance(other, set) and isinstance(value, set):
+            value = value | other
+        else:
+            value = other
+    if isinstance(value, dict) and value is not values[-1]:
+        # merged from several layers, merge_layers already copied it
+        return value
+    return copy_value(value)
+
+
+def copy_value(value):
+    """
+    Copies the containers in a value taken from a layer, so changing what
+    the state returns never changes the layer
+    """
+    if isinstance(value, dict):
+        return merge_layers([value])
+    if isinstance(value, list):
+        return [copy_value(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def merge_layers(layers):
+    merged = DotifyDict()
+    for layer in layers:
+        for key in layer:
+            if not dict.__contains__(merged, key):
+                values = [other[key] for other in layers if dict.__contains__(other, key)]
+                dict.__setitem__(merged, key, merge_values(values))
+    return merged
 
 
 class State(DotifyDict):
@@ -8,16 +57,25 @@ class State(DotifyDict):
      - config settings | by the users environment
      - options settings | by the user at command runtime
     To produce a final "state" of the configuration
+
+    The layers are never changed, a key is resolved through them the first
+    time it is read and the result, with any dict, list or set in it
+    copied, is kept until the layers it came from change. The set of keys
+    is worked out once per compile.
     """
 
     def __init__(self):
+        object.__setattr__(self, '_layers', [])
+        object.__setattr__(self, '_options', [])
+        object.__setattr__(self, '_overrides', DotifyDict())
+        object.__setattr__(self, '_key_list', None)
         self.cli = None
         self.reinit()
 
     def reinit(self):
-        self.state_list = list()
-        self.options_list = list()
-        self.config_list = list()
+        object.__setattr__(self, 'state_list', list())
+        object.__setattr__(self, 'options_list', list())
+        object.__setattr__(self, 'config_list', list())
 
     def add_options(self, options):
         self.options_list.append(options)
@@ -29,25 +87,131 @@ class State(DotifyDict):
         self.config_list.append(config)
 
     def compile(self):
-        for state in self.state_list:
-            self.update(state)
-
-        for config in self.config_list:
-            self.update(config)
-
-        for option in reversed(self.options_list):
-            self.update(dict([(k,v) for k,v in option.items() if v is not None]))
+        layers = self.state_list + self.config_list
+        options = list(reversed(self.options_list))
+        stale = set(self._overrides)
+        stale.discard('cli')
+        if len(layers) == len(self._layers) and all(a is b for a, b in zip(layers, self._layers)):
+            # only the options changed so only their keys need resolving again
+            for option in self._options + options:
+                stale.update(option)
+            # containers handed out before may have been changed since
+            stale.update(k for k, v in dict.iteritems(self) if isinstance(v, (dict, list, set)))
+            for key in stale:
+                dict.pop(self, key, None)
+        else:
+            dict.clear(self)
+        object.__setattr__(self, '_layers', layers)
+        object.__setattr__(self, '_options', options)
+        object.__setattr__(self, '_overrides', DotifyDict({'cli': self._overrides['cli']}))
+        object.__setattr__(self, '_key_list', None)
 
-        self.pop('state_list')
-        self.pop('config_list')
-        self.pop('options_list')
         self.cli.state = self
         for handler in self.cli.handlers:
             handler.state = self
 
+    def _resolve(self, key):
+        values = [layer[key] for layer in self._layers if dict.__contains__(layer, key)]
+        values += [o[key] for o in self._options
+                   if dict.__contains__(o, key) and o[key] is not None]
+        if dict.__contains__(self._overrides, key):
+            values.append(self._overrides[key])
+        if not values:
+            return _MISSING
+        return merge_values(values)
+
+    def _keys(self):
+        keys = self._key_list
+        if keys is None:
+            keys = []
+            seen = set()
+            # an option left unset does not add a key, the same as _resolve
+            names = [key for layer in self._layers for key in layer]
+            names += [key for option in self._options for key in option
+                      if option[key] is not None]
+            names += list(self._overrides)
+            for key in names:
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+            object.__setattr__(self, '_key_list', keys)
+        return keys
+
+    def __getitem__(self, key):
+        if '.' in key:
+            myKey, restOfKey = key.split('.', 1)
+            target = self[myKey]
+            if not isinstance(target, DotifyDict):
+                raise KeyError('cannot get "{0}" in "{1}" ({2})'.format(restOfKey, myKey, repr(target)))
+            return target[restOfKey]
+        try:
+            return dict.__getitem__(self, key)
+        except KeyError:
+            pass
+        value = self._resolve(key)
+        if value is _MISSING:
+            return None
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._overrides[key] = value
+        dict.pop(self, key.split('.', 1)[0], None)
+        object.__setattr__(self, '_key_list', None)
+
+    def __contains__(self, key):
+        if '.' in key:
+            myKey, restOfKey = key.split('.', 1)
+            target = self[myKey]
+            return isinstance(target, DotifyDict) and restOfKey in target
+        return dict.__contains__(self, key) or self._resolve(key) is not _MISSING
+
+    def pop(self, key, *default):
+        self._overrides.pop(key, None)
+        value = self[key] if key in self else _MISSING
+        dict.pop(self, key, None)
+        object.__setattr__(self, '_key_list', None)
+        if value is _MISSING:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        return value
+
+    def keys(self):
+        return self._keys()
+
+    def iterkeys(self):
+        return iter(self._keys())
+
+    __iter__ = iterkeys
+
+    def values(self):
+        return [self[k] for k in self._keys()]
+
+    def itervalues(self):
+        return (self[k] for k in self._keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self._keys()]
+
+    def iteritems(self):
+        return ((k, self[k]) for k in self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    __setattr__ = __setitem__
+    __getattr__ = __getitem__
+
 state = State()
 
 
+_class_states = {}
+
+
 class StateMixin(object):
     """
     Mixin that provides static configuration settings to instance
@@ -55,20 +219,23 @@ class StateMixin(object):
     """
 
     def __init__(self, *args, **kwargs):
-        # Get a List of all the Classes we in our MRO, find any attribute named
-        #     State on them, and then merge them together in order of MRO
-        states = reversed([x.State for x in self.__class__.mro()
-                          if hasattr(x, "State")])
+        cls = self.__class__
+        try:
+            class_state = _class_states[cls]
+        except KeyError:
+            # Get a List of all the Classes we in our MRO, find any attribute named
+            #     State on them, and then merge them together in order of MRO
+            states = [x.__dict__['State'] for x in reversed(cls.mro())
+                      if 'State' in x.__dict__]
+            class_state = _class_states[cls] = merge_layers(
+                [DotifyDict(dict([x for x in s.__dict__.items() if not x[0].startswith("_")]))
+                 for s in states])
         final_state = DotifyDict()
-
-        # Merge the State classes into one dict
-        for state in states:
-            final_state.update(DotifyDict(dict([x for x in state.__dict__.items()
-                                           if not x[0].startswith("_")])))
+        dict.update(final_state, class_state)
 
         # Update the final state with any kwargs passed in
-        for key in final_state.keys():
-            if key in kwargs:
+        for key in list(kwargs):
+            if key in final_state:
                 final_state[key] = kwargs.pop(key)
 
         self._state = final_state
@@ -0,0 +1,188 @@
+"""
+Timings for each phase of a cli run
+
+The hot path wraps its phases in ``with phase(name):``. While no hook is
+installed that returns a shared do nothing object, so the cost is a
+function call and a truth test. Once a hook is installed every phase is
+timed and, as it finishes, passed to each hook:
+
+    from battalion.timing import add_hook
+
+    def to_statsd(phase):
+        statsd.timing('.'.join(phase.path), phase.seconds * 1000)
+
+    add_hook(to_statsd)
+
+Phases nest per thread, so a command invoked from inside another command
+shows up beneath it. Work handed to another thread runs ``within`` the
+phase that handed it over, so it stays in the same tree. ``--profile`` installs a Profiler which prints the
+phases of the run as a tree.
+"""
+from __future__ import absolute_import
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+
+_hooks = ()
+_local = threading.local()
+
+
+def add_hook(hook):
+    """
+    Calls hook with every Phase as it finishes, from the thread it ran in
+    """
+    global _hooks
+    _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    global _hooks
+    _hooks = tuple(h for h in _hooks if h != hook)
+
+
+class _NoPhase(object):
+    """
+    Stands in for a phase while nothing is listening, it is false so
+    callers can skip gathering attrs nobody will read
+    """
+    __slots__ = ()
+
+    def __nonzero__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def current():
+    """
+    Returns the innermost phase running on this thread, if any
+    """
+    stack = _local.__dict__.get('stack')
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def within(parent):
+    """
+    Nests the phases started by the block beneath parent, a phase taken
+    with current() on the thread that handed the work over
+    """
+    if parent is None:
+        yield
+        return
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(parent)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def phase(name):
+    if not _hooks:
+        return _NO_PHASE
+    return Phase(name)
+
+
+class Phase(object):
+    __slots__ = ('name', 'parent', 'children', 'attrs', 'thread',
+                 'start', 'seconds', 'error')
+
+    def __init__(self, name):
+        self.name = name
+        self.parent = None
+        self.children = []
+        self.attrs = {}
+        self.thread = None
+        self.start = None
+        self.seconds = None
+        self.error = None
+
+    def __repr__(self):
+        return '<Phase {0} {1}>'.format(self.name, self.seconds)
+
+    @property
+    def path(self):
+        names = []
+        phase = self
+        while phase is not None:
+            names.append(phase.name)
+            phase = phase.parent
+        return tuple(reversed(names))
+
+    @property
+    def self_seconds(self):
+        return self.seconds - sum(c.seconds for c in self.children)
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        if stack:
+            self.parent = stack[-1]
+        stack.append(self)
+        self.thread = threading.current_thread().ident
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.time() - self.start
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _local.stack.pop()
+        if self.parent is not None:
+            self.parent.children.append(self)
+        for hook in _hooks:
+            hook(self)
+        return False
+
+
+class Profiler(object):
+    """
+    Hook that keeps the outermost phases started while it is installed so
+    they can be printed as a tree
+    """
+
+    def __init__(self):
+        self.roots = []
+        self.outside = None
+
+    def __call__(self, phase):
+        if phase.parent is self.outside:
+            self.roots.append(phase)
+
+    def __enter__(self):
+        self.outside = current()
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_hook(self)
+        return False
+
+    def format(self):
+        lines = ['{0:<50} {1:>10} {2:>10}'.format('phase', 'total ms', 'self ms')]
+
+        def walk(phase, depth):
+            lines.append('{0:<50} {1:>10.3f} {2:>10.3f}'.format(
+                '  ' * depth + phase.name, phase.seconds * 1000, phase.self_seconds * 1000))
+            for child in phase.children:
+                walk(child, depth + 1)
+
+        for root in self.roots:
+            walk(root, 0)
+        return '\n'.join(lines)
+
+    def report(self, stream=None):
+        print >> (stream or sys.stderr), self.format()
+
+
+def installed(hook_class):
+    return any(isinstance(h, hook_class) for h in _hooks)
@@ -0,0 +1,85 @@
+"""
+Traces of the commands a cli run invokes
+
+Every CommandInvocation is a span carrying the command, the handler it
+was looked up on, its arguments, the fixtures it used, its duration and
+its outcome. Commands invoked from inside a command are spans beneath it,
+along with the other phases of the run, see battalion.timing.
+
+``mycli --trace=FILE`` writes the trace of the run to FILE, in the Chrome
+trace event format by default (load it in chrome://tracing or Perfetto)
+or, with ``--trace-format=json``, as a tree of spans.
+
+Arguments whose name contains any of ``Tracer.redact`` are written as
+``***``, the cli's ``trace_redact`` state setting overrides the list.
+"""
+from __future__ import absolute_import
+import os
+import json
+from .timing import Profiler
+
+
+REDACTED = '***'
+FORMATS = ('chrome', 'json')
+
+
+class Tracer(Profiler):
+    """
+    Hook that keeps every span started while it is installed
+    """
+    redact = ('password', 'secret', 'token', 'key')
+
+    def __init__(self, redact=None):
+        super(Tracer, self).__init__()
+        if redact is not None:
+            self.redact = tuple(redact)
+
+    def redacted(self, arguments):
+        return dict((k, REDACTED if any(r in k.lower() for r in self.redact) else v)
+                    for k, v in arguments.items())
+
+    def span_args(self, span):
+        args = dict(span.attrs)
+        if 'arguments' in args:
+            args['arguments'] = self.redacted(args['arguments'])
+        args['outcome'] = 'error' if span.error else 'ok'
+        if span.error:
+            args['error'] = span.error
+        return args
+
+    def to_tree(self):
+        def walk(span):
+            node = self.span_args(span)
+            node.update(name=span.name, start=span.start, seconds=span.seconds,
+                        children=[walk(c) for c in span.children])
+            return node
+        return [walk(root) for root in self.roots]
+
+    def to_chrome(self):
+        pid = os.getpid()
+        events = []
+
+        def walk(span):
+            events.append({'name': span.name,
+                           'cat': 'command' if 'command' in span.attrs else 'phase',
+                           'ph': 'X',
+                           'ts': span.start * 1e6,
+                           'dur': span.seconds * 1e6,
+                           'pid': pid,
+                           'tid': span.thread,
+                           'args': self.span_args(span)})
+            for child in span.children:
+                walk(child)
+
+        for root in self.roots:
+            walk(root)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path, format='chrome'):
+        if format not in FORMATS:
+            raise ValueError('trace format must be one of {0}, got "{1}"'.format(
+                ', '.join(FORMATS), format))
+        data = self.to_chrome() if format == 'chrome' else self.to_tree()
+        with open(path, 'w') as f:
+            # arguments can be anything so fall back to their repr
+            json.dump(data, f, indent=1, default=repr)
@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+import logging
+from inspect import cleandoc
+from docopt import (DocoptExit, Dict, Option, AnyOptions, TokenStream,
+                    printable_usage, parse_defaults, parse_pattern,
+                    formal_usage, parse_argv, extras)
+
+
+LOG = logging.getLogger(__name__)
+
+
+class CompiledUsage(object):
+    """
+    A docopt usage string that has been tokenized and parsed once into
+    a reusable pattern so that repeated dispatches only have to match argv
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.doc = cleandoc(source)
+        self.usage = printable_usage(self.doc)
+        self.options = parse_defaults(self.doc)
+        self.pattern = parse_pattern(formal_usage(self.usage), self.options)
+        pattern_options = set(self.pattern.flat(Option))
+        for ao in self.pattern.flat(AnyOptions):
+            ao.children = list(set(parse_defaults(self.doc)) - pattern_options)
+        self.pattern.fix()
+
+    def parse(self, argv, help=True, version=None, options_first=False):
+        DocoptExit.usage = self.usage
+        argv = parse_argv(TokenStream(argv, DocoptExit), list(self.options),
+                          options_first)
+        extras(help, version, argv, self.doc)
+        matched, left, collected = self.pattern.match(argv)
+        if matched and left == []:
+            # list defaults live on the compiled pattern so hand out copies
+            return Dict((a.name, list(a.value) if type(a.value) is list else a.value)
+                        for a in (self.pattern.flat() + collected))
+        raise DocoptExit()
+
+
+class UsageCache(object):
+    """
+    Compiled usage patterns keyed by the class or command that owns the
+    docstring, a pattern is recompiled when its owners docstring changes
+    """
+
+    def __init__(self):
+        self._patterns = {}
+
+    def get(self, owner, source):
+        try:
+            compiled = self._patterns[owner]
+            if compiled.source is source or compiled.source == source:
+                return compiled
+        except KeyError:
+            pass
+        LOG.debug('compiling usage for "%s"', owner)
+        compiled = self._patterns[owner] = CompiledUsage(source)
+        return compiled
+
+    def invalidate(self, owner=None):
+        if owner is None:
+            self._patterns.clear()
+        else:
+            self._patterns.pop(owner, None)
+
+    def parse(self, owner, source, argv, **kwargs):
+        return self.get(owner, source).parse(argv, **kwargs)
+
+
+usage_cache = UsageCache()
@@ -1,40 +1,63 @@
 from __future__ import absolute_import
-from inspect import getargspec, getcallargs
-from pyul.coreUtils import DotifyDict
+import re
+import sys
+import logging
+import threading
+from contextlib import contextmanager
+from .dotify import DotifyDict
 from .state import state
 from .registry import registry
+from .spec import get_spec
+from .handler import HandlerMarker
+from .pool import get_pool, ThreadResult
+from .exceptions import CommandTimeout
+from .timing import phase, current, within
+from .cache import cache_key, get_cache
+
+
+LOG = logging.getLogger(__name__)
+
+
+_IGNORED_KEYS = frozenset(['help', 'version', 'cli', 'options', 'column_padding',
+                           'default_config', 'config'])
+# option or setting name -> state key, the same names are cleaned up on
+# every dispatch
+_state_keys = {}
+
+
+def state_key(key):
+    try:
+        return _state_keys[key]
+    except KeyError:
+        pass
+    k = str(key)
+    if k.startswith('--'):
+        k = k[2:]
+    if k.startswith('-'):
+        k = k[1:]
+    k = _state_keys[key] = k.replace('-', '_')
+    return k
 
 
 def cleanup_data(data):
-    new_data = {}
+    new_data = DotifyDict()
     for k, v in data.items():
-        if k.startswith('--'):
-            k = k[2:]
-        if k.startswith('-'):
-            k = k[1:]
-        k = k.replace('-', '_')
-        if k in ['help', 'version', 'cli', 'options', 'column_padding', 'default_config', 'config']:
+        k = state_key(k)
+        if k in _IGNORED_KEYS:
             continue
         new_data[k] = v
-    return DotifyDict(new_data)
+    return new_data
 
 
 def get_command_args(command):
-    args = [a for a in getargspec(command).args if a not in registry._fixtures.keys() and a != 'cli']
-    return args
+    return list(get_spec(command).command_args(registry.fixture_names))
 
 
 def get_command_spec(command, without_fixtures=True):
-    spec = getargspec(command)
-    positional = [None] * (len(spec.args) - len(spec.defaults or []))
-    kwargs = getcallargs(command, *positional)
+    spec = get_spec(command)
     if without_fixtures:
-        for name in registry._fixtures.keys():
-            try:
-                kwargs.pop(name)
-            except KeyError:
-                pass
-    return kwargs
+        return dict(spec.command_kwargs(registry.fixture_names))
+    return dict(spec.callargs)
 
 
 def parse_doc_section(name, source):
@@ -43,16 +66,125 @@ def parse_doc_section(name, source):
     return [s.strip() for s in pattern.findall(source)]
 
 
+@contextmanager
+def redirect_output(stdout, stderr):
+    """
+    Points sys.stdout, sys.stderr and the logging handlers writing to them
+    at the given streams for the duration of the block
+    """
+    saved = sys.stdout, sys.stderr
+    handlers = [h for h in logging.root.handlers if isinstance(h, logging.StreamHandler)]
+    streams = [h.stream for h in handlers]
+    sys.stdout, sys.stderr = stdout, stderr
+    for handler in handlers:
+        handler.stream = stdout if handler.stream is saved[0] else stderr
+    try:
+        yield
+    finally:
+        sys.stdout, sys.stderr = saved
+        for handler, stream in zip(handlers, streams):
+            handler.stream = stream
+
+
+def is_stream(rv):
+    """
+    True for return values that are produced lazily, generators and other
+    iterators, as opposed to strings, lists and dicts
+    """
+    return hasattr(rv, 'next') and iter(rv) is rv
+
+
+# set on threads running a command submitted with a timeout
+_command_thread = threading.local()
+
+
+def _run_command(invoke, args, kwargs, parent):
+    _command_thread.active = True
+    try:
+        with within(parent):
+            return invoke(*args, **kwargs)
+    finally:
+        _command_thread.active = False
+
+
 class CommandInvocation(object):
+    __slots__ = ('command', 'owner')
 
-    def __init__(self, cmd):
+    def __init__(self, cmd, owner=None):
         self.command = cmd
+        # the cli or handler the command was looked up on, for tracing
+        self.owner = owner
 
     def __call__(self, *args, **kwargs):
-        command_kwargs = get_command_spec(self.command, without_fixtures=False)
-        for k, v in sorted(command_kwargs.items()):
-            if registry.is_fixture(k):
-                kwargs[k] = registry.get_fixture(k, state)
-        if state.debug:
-            LOG.debug("State:\n{0}".format(state))
-        return self.command(*args, **kwargs)
\ No newline at end of file
+        timeout = get_spec(self.command).timeout
+        if timeout:
+            return self.wait(self.submit(*args, **kwargs), timeout)
+        return self.invoke(*args, **kwargs)
+
+    def submit(self, *args, **kwargs):
+        """
+        Starts the command on the shared command pool and returns its
+        AsyncResult, so several commands can overlap their I/O
+
+        A command submitted from another submitted command gets a thread of
+        its own, waiting for a pool worker while holding one could use up
+        the pool.
+        """
+        work = (self.invoke, args, kwargs, current())
+        if getattr(_command_thread, 'active', False):
+            return ThreadResult(_run_command, work)
+        pool = get_pool('commands', state.command_workers or 1)
+        return pool.apply_async(_run_command, work)
+
+    def wait(self, result, timeout):
+        from multiprocessing import TimeoutError
+        try:
+            return result.get(timeout)
+        except TimeoutError:
+            raise CommandTimeout(self.command.__name__, timeout)
+
+    def describe(self, spec, fixtures, args, kwargs):
+        arguments = dict(zip(spec.args, args))
+        arguments.update(kwargs)
+        handler = self.owner.path if isinstance(self.owner, HandlerMarker) else None
+        return {'command': self.command.__name__,
+                'handler': handler,
+                'arguments': arguments,
+                'fixtures': list(fixtures)}
+
+    def cache_arguments(self, spec, args, kwargs):
+        arguments = dict(spec.command_kwargs(registry.fixture_names))
+        arguments.update(zip(spec.args, args))
+        arguments.update(kwargs)
+        return arguments
+
+    def invoke(self, *args, **kwargs):
+        with phase(self.command.__name__) as span:
+            spec = get_spec(self.command)
+            fixtures = spec.fixture_args(registry.fixture_names)
+            if span:
+                span.attrs.update(self.describe(spec, fixtures, args, kwargs))
+            key = cache = None
+            # a dry run has to reach the dryrun() calls to record its plan
+            if spec.cache is not None and state.dryrun is not True:
+                cache = get_cache(state)
+            if cache is not None:
+                # checked before the fixtures so a hit builds none of them
+                key = cache_key(self.command, self.cache_arguments(spec, args, kwargs),
+                                state, spec.cache)
+                hit, rv = (False, None) if state.no_cache else cache.get(key)
+                if span:
+                    span.attrs['cache'] = 'hit' if hit else 'miss'
+                if hit:
+                    return rv
+            if fixtures:
+                with phase('fixtures'):
+                    kwargs.update(registry.get_fixtures(fixtures, state, state.fixture_workers or 0))
+            if state.debug:
+                LOG.debug("State:\n{0}".format(state))
+            rv = self.command(*args, **kwargs)
+            if key is not None:
+                if is_stream(rv):
+                    rv = list(rv)
+                cache.set(key, rv, spec.cache.ttl)
+            return rv
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Performance benchmarks for battalion
+
+Every ``bench_*`` module has a ``run()`` returning a list of result rows
+and a ``QUICK`` dict of smaller arguments for ``run()``. Keys ending in
+``seconds`` and keys starting with ``us_``, ``bytes_`` or ``objects_``
+are measurements where lower is better, every other key identifies the
+case a row measured.
+
+    python -m battalion_benchmarks --help
+"""
+from __future__ import absolute_import
+
+
+BENCHMARKS = ('registry', 'autodoc', 'dispatch', 'state', 'invocation',
+              'fixtures', 'config', 'output', 'memory')
+
+
+def is_timing(key):
+    return key.endswith('seconds') or key.startswith(('us_', 'bytes_', 'objects_'))
+
+
+def case_of(row):
+    return tuple(sorted((k, v) for k, v in row.items() if not is_timing(k)))
+
+
+def compare(baseline, results, threshold=0.25):
+    """
+    Returns a row for every timing in results that has a counterpart in
+    baseline, with its ratio to the baseline and whether it regressed by
+    more than threshold
+    """
+    rows = []
+    for name, bench_results in sorted(results.items()):
+        previous = dict((case_of(r), r) for r in baseline.get(name, []))
+        for result in bench_results:
+            before = previous.get(case_of(result))
+            if before is None:
+                continue
+            for key in sorted(k for k in result if is_timing(k) and k in before):
+                ratio = result[key] / before[key] if before[key] else 1.0
+                rows.append({'benchmark': name,
+                             'case': ' '.join('{0}={1}'.format(k, v) for k, v in case_of(result)),
+                             'timing': key,
+                             'baseline': before[key],
+                             'current': result[key],
+                             'ratio': ratio,
+                             'regressed': ratio > 1 + threshold})
+    return rows
+
+
+def format_table(results, keys=None):
+    if keys is None:
+        keys = sorted(set(k for result in results for k in result),
+                      key=lambda k: (is_timing(k), k))
+    cells = [[str(k) for k in keys]]
+    for result in results:
+        cells.append(['{0:.6f}'.format(result[k]) if isinstance(result.get(k), float)
+                      else str(result.get(k, '')) for k in keys])
+    widths = [max(len(row[i]) for row in cells) for i in range(len(keys))]
+    return '\n'.join(' '.join(c.rjust(w) for c, w in zip(row, widths)) for row in cells)
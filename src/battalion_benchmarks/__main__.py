@@ -0,0 +1,69 @@
+"""
+Runs the battalion benchmarks, python -m battalion_benchmarks
+
+Usage:
+    battalion_benchmarks [options] [<benchmark>...]
+
+Options:
+    -h, --help              Show this screen.
+    --quick                 Run every benchmark with its smaller QUICK arguments
+    --json=<FILE>           Write the results to FILE as JSON
+    --compare=<BASELINE>    Compare the results with a JSON file written by --json
+    --threshold=<RATIO>     Slowdown over the baseline that counts as a regression [default: 0.25]
+
+Benchmarks default to all of them: registry, autodoc, dispatch, state,
+invocation, fixtures, config, output and memory. Exits with 1 if
+--compare finds a regression.
+"""
+from __future__ import absolute_import
+import sys
+import json
+import time
+import platform
+from importlib import import_module
+from docopt import docopt
+from . import BENCHMARKS, compare, format_table
+
+
+def run(names, quick=False):
+    results = {}
+    for name in names:
+        module = import_module('battalion_benchmarks.bench_{0}'.format(name))
+        kwargs = getattr(module, 'QUICK', {}) if quick else {}
+        print '== {0}'.format(name)
+        results[name] = module.run(**kwargs)
+        print format_table(results[name])
+        print
+        sys.stdout.flush()
+    return results
+
+
+def main(argv=None):
+    options = docopt(__doc__, argv)
+    names = options['<benchmark>'] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        sys.exit('Unknown benchmarks: {0}'.format(', '.join(unknown)))
+    results = run(names, options['--quick'])
+    if options['--json']:
+        with open(options['--json'], 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'time': time.time(),
+                       'quick': options['--quick'],
+                       'results': results}, f, indent=2, sort_keys=True)
+    if options['--compare']:
+        with open(options['--compare']) as f:
+            baseline = json.load(f)['results']
+        rows = compare(baseline, results, float(options['--threshold']))
+        print '== compared with {0}'.format(options['--compare'])
+        print format_table(rows, ['benchmark', 'case', 'timing', 'baseline',
+                                  'current', 'ratio', 'regressed'])
+        regressions = [r for r in rows if r['regressed']]
+        if regressions:
+            print '{0} timings regressed'.format(len(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Autodoc generation benchmark
+
+Times the first instantiation of synthetic CLIs, which is when
+AutoDocCommand documents the cli, its handlers and every command.
+
+    python -m battalion_benchmarks.bench_autodoc
+"""
+from __future__ import absolute_import
+import timeit
+from . import format_table
+from .bench_registry import build_cli
+
+
+SIZES = (10, 100, 1000, 10000)
+QUICK = {'sizes': (10, 100)}
+
+
+def run(sizes=SIZES):
+    results = []
+    for size in sizes:
+        cli_class = build_cli(size)
+        seconds = timeit.timeit(cli_class, number=1)
+        results.append({'commands': size,
+                        'seconds': seconds,
+                        'us_per_command': seconds / size * 1e6})
+    return results
+
+
+def main():
+    print format_table(run())
+
+
+if __name__ == "__main__":
+    main()
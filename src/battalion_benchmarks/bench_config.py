@@ -0,0 +1,63 @@
+"""
+Config loading benchmark
+
+Writes a multi-megabyte YAML config and times loading it through the
+ConfigCache, cold (parsed) and warm (unchanged file, served from the
+cache), with the C loader and with the pure Python one.
+
+    python -m battalion_benchmarks.bench_config
+"""
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import timeit
+import yaml
+from battalion.config import ConfigCache
+
+
+SERVICES = 20000
+WARM_LOADS = 20
+QUICK = {'services': 500}
+
+
+def write_config(path, services=SERVICES):
+    data = {'msg': 'benchmark',
+            'services': dict(('service{0}'.format(i),
+                              {'host': 'host{0}.example.com'.format(i),
+                               'port': 8000 + i % 1000,
+                               'tags': ['a', 'b', 'c']})
+                             for i in range(services))}
+    with open(path, 'w') as ymlfile:
+        yaml.dump(data, ymlfile, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+    return os.path.getsize(path)
+
+
+def run(services=SERVICES):
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'bench.cfg')
+    results = []
+    try:
+        size = write_config(path, services)
+        loaders = [('c', getattr(yaml, 'CSafeLoader', None)), ('python', yaml.SafeLoader)]
+        for name, loader in loaders:
+            if loader is None:
+                continue
+            cache = ConfigCache(loader)
+            cold = timeit.timeit(lambda: cache.load(path), number=1)
+            warm = timeit.timeit(lambda: cache.load(path), number=WARM_LOADS) / WARM_LOADS
+            results.append({'loader': name, 'bytes': size,
+                            'cold_seconds': cold, 'warm_seconds': warm})
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def main():
+    print "{0:>8} {1:>10} {2:>14} {3:>14}".format('loader', 'bytes', 'cold seconds', 'warm seconds')
+    for result in run():
+        print "{loader:>8} {bytes:>10} {cold_seconds:>14.4f} {warm_seconds:>14.4f}".format(**result)
+
+
+if __name__ == "__main__":
+    main()
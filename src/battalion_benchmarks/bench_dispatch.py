@@ -0,0 +1,76 @@
+"""
+Dispatch latency benchmark
+
+Cold runs a synthetic CLI's main in a fresh interpreter, which pays for
+the interpreter, imports, registration, autodoc and dispatch. Warm runs
+the same command line repeatedly on an already built cli, which is what
+the daemon, batch and shell modes pay per command. Depth runs a command
+at the bottom of a chain of nested handlers.
+
+    python -m battalion_benchmarks.bench_dispatch
+"""
+from __future__ import absolute_import
+import os
+import sys
+import time
+import subprocess
+from . import format_table
+from .bench_registry import build_cli, build_tree
+
+
+SIZES = (10, 100, 1000, 10000)
+DEPTHS = (1, 4, 16)
+COLD_RUNS = 3
+WARM_CALLS = 200
+QUICK = {'sizes': (10, 100), 'depths': (1, 4), 'cold_runs': 1, 'warm_calls': 20}
+
+ARGV = ['handler0', 'cmd0', '1']
+
+COLD_SCRIPT = """
+import sys
+from battalion_benchmarks.bench_registry import build_cli
+build_cli(int(sys.argv[1])).main(sys.argv[2:])
+"""
+
+
+def cold(size, runs):
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(runs):
+            start = time.time()
+            subprocess.check_call([sys.executable, '-c', COLD_SCRIPT, str(size)] + ARGV,
+                                  cwd=src, stdout=devnull, stderr=devnull)
+            timings.append(time.time() - start)
+    # the best run is the one least disturbed by the rest of the machine
+    return min(timings)
+
+
+def warm(cli, argv, calls):
+    cli.execute(argv)
+    start = time.time()
+    for _ in range(calls):
+        cli.execute(argv)
+    return (time.time() - start) / calls
+
+
+def run(sizes=SIZES, depths=DEPTHS, cold_runs=COLD_RUNS, warm_calls=WARM_CALLS):
+    results = []
+    for size in sizes:
+        results.append({'mode': 'cold', 'commands': size,
+                        'us_per_call': cold(size, cold_runs) * 1e6})
+        results.append({'mode': 'warm', 'commands': size,
+                        'us_per_call': warm(build_cli(size)(), ARGV, warm_calls) * 1e6})
+    for depth in depths:
+        cli_class, argv = build_tree(depth)
+        results.append({'mode': 'depth', 'depth': depth,
+                        'us_per_call': warm(cli_class(), argv, warm_calls) * 1e6})
+    return results
+
+
+def main():
+    print format_table(run())
+
+
+if __name__ == "__main__":
+    main()
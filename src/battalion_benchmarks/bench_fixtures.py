@@ -0,0 +1,51 @@
+"""
+Fixture resolution benchmark
+
+Resolves a set of fixtures that each sleep to stand in for network or
+disk latency, once serially and once with a worker per fixture. The
+concurrent wall time should be close to the slowest fixture rather than
+the sum of them.
+
+    python -m battalion_benchmarks.bench_fixtures
+"""
+from __future__ import absolute_import
+import time
+from battalion.registry import Registry
+
+
+FIXTURES = 3
+LATENCY = 0.1
+QUICK = {'latency': 0.01}
+
+
+def make_fixture(value, latency):
+    def func(state):
+        time.sleep(latency)
+        return value
+    return func
+
+
+def run(fixtures=FIXTURES, latency=LATENCY):
+    results = []
+    for workers in (0, fixtures):
+        reg = Registry()
+        names = tuple('fixture{0}'.format(i) for i in range(fixtures))
+        for name in names:
+            reg.register_fixture(make_fixture(name, latency), name)
+        start = time.time()
+        reg.get_fixtures(names, None, workers)
+        results.append({'workers': workers,
+                        'fixtures': fixtures,
+                        'latency': latency,
+                        'seconds': time.time() - start})
+    return results
+
+
+def main():
+    print "{0:>8} {1:>9} {2:>8} {3:>8}".format('workers', 'fixtures', 'latency', 'seconds')
+    for result in run():
+        print "{workers:>8} {fixtures:>9} {latency:>8.2f} {seconds:>8.3f}".format(**result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Fixture heavy CommandInvocation benchmark
+
+Calls a command that takes a growing number of fixtures through
+CommandInvocation, with fixtures rebuilt on every call and with process
+scoped fixtures that are built once and then reused.
+
+    python -m battalion_benchmarks.bench_invocation
+"""
+from __future__ import absolute_import
+import itertools
+import time
+from battalion.registry import registry
+from battalion.utils import CommandInvocation
+from . import format_table
+
+
+FIXTURES = (1, 10, 50)
+CALLS = 1000
+QUICK = {'calls': 100}
+
+_counter = itertools.count()
+
+
+def make_fixture(value):
+    def func(state):
+        return value
+    return func
+
+
+def make_command(fixture_count, scope):
+    names = ['benchfixture{0}'.format(next(_counter)) for _ in range(fixture_count)]
+    for name in names:
+        registry.register_fixture(make_fixture(name), name, scope)
+    namespace = {}
+    exec 'def cmd(cli, {0}):\n    return cli\n'.format(', '.join(names)) in namespace
+    return namespace['cmd']
+
+
+def run(fixtures=FIXTURES, calls=CALLS):
+    results = []
+    for count in fixtures:
+        for scope in ('invocation', 'process'):
+            invocation = CommandInvocation(make_command(count, scope))
+            invocation()
+            start = time.time()
+            for _ in range(calls):
+                invocation()
+            results.append({'fixtures': count, 'scope': scope,
+                            'us_per_call': (time.time() - start) / calls * 1e6})
+    return results
+
+
+def main():
+    print format_table(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Memory benchmark
+
+Builds a synthetic CLI in a fresh interpreter and reports how much the
+process grew, and how many objects the garbage collector tracks, per
+registered command: once the commands are registered, once the cli is
+created and has documented them, and once every command has been looked
+up as ``cli.<handler>.<command>`` a few times over, the way a service
+embedding the cli calls them. Every command has one alias.
+
+    python -m battalion_benchmarks.bench_memory
+"""
+from __future__ import absolute_import
+import os
+import sys
+import gc
+import json
+import resource
+import subprocess
+from battalion.handler import HandlerMarker
+from . import format_table
+from .bench_registry import build_cli
+
+
+SIZES = (100, 1000, 10000)
+LOOKUPS = 3
+QUICK = {'sizes': (100,)}
+
+SCRIPT = """
+import sys, json
+from battalion_benchmarks.bench_memory import measure
+print json.dumps(measure(int(sys.argv[1])))
+"""
+
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        # the peak is all that is available elsewhere, good enough while
+        # memory only grows
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def snapshot():
+    gc.collect()
+    return rss(), len(gc.get_objects())
+
+
+def measure(size):
+    """
+    Returns a result row per stage for a cli of size commands, run in a
+    fresh interpreter so nothing else has been allocated
+    """
+    stages = []
+    before = snapshot()
+    cli_class = build_cli(size, aliases=1)
+    stages.append(('registered', snapshot()))
+    cli = cli_class()
+    stages.append(('documented', snapshot()))
+    kept = []
+    for _ in range(LOOKUPS):
+        for handler in cli.commands.values():
+            if isinstance(handler, HandlerMarker):
+                for name in handler.commands:
+                    kept.append(getattr(handler, name))
+    stages.append(('invoked', snapshot()))
+    return [{'commands': size, 'stage': stage,
+             'bytes_per_command': float(memory - before[0]) / size,
+             'objects_per_command': float(objects - before[1]) / size}
+            for stage, (memory, objects) in stages]
+
+
+def run(sizes=SIZES):
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for size in sizes:
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT, str(size)], cwd=src)
+        results.extend(json.loads(output.splitlines()[-1]))
+    return results
+
+
+def main():
+    print format_table(run())
+
+
+if __name__ == "__main__":
+    main()
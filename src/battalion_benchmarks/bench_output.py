@@ -0,0 +1,53 @@
+"""
+Output benchmark
+
+Streams a large result set of resource records through every --output
+format into /dev/null, as a pipeline reading a command's output would
+receive it. The encoder column shows which JSON encoder was available.
+
+    python -m battalion_benchmarks.bench_output
+"""
+from __future__ import absolute_import
+import os
+import time
+from battalion import output
+from . import format_table
+
+
+RECORDS = (10000, 100000, 1000000)
+QUICK = {'records': (1000,)}
+
+
+def make_records(count):
+    for i in xrange(count):
+        yield {'id': i,
+               'name': 'resource-{0}'.format(i),
+               'region': 'us-east',
+               'tags': ['web', 'prod'],
+               'size': i * 1.5}
+
+
+def run(records=RECORDS):
+    encoder = 'ujson' if output.ujson is not None else 'json'
+    formats = sorted(f for f in output.FORMATS if output.check_format(f) is None)
+    results = []
+    with open(os.devnull, 'wb') as devnull:
+        for count in records:
+            for format in formats:
+                start = time.time()
+                output.write(make_records(count), format, devnull)
+                seconds = time.time() - start
+                results.append({'format': format,
+                                'records': count,
+                                'encoder': encoder if 'json' in format else format,
+                                'seconds': seconds,
+                                'us_per_record': seconds / count * 1e6})
+    return results
+
+
+def main():
+    print format_table(run())
+
+
+if __name__ == "__main__":
+    main()
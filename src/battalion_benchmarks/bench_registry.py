@@ -0,0 +1,85 @@
+"""
+Registration scaling benchmark
+
+Builds synthetic CLIs with a growing number of commands spread over
+handlers and times how long class creation (and so registration) takes.
+The time per command should stay flat as the number of commands grows.
+
+    python -m battalion_benchmarks.bench_registry
+"""
+from __future__ import absolute_import
+import itertools
+import timeit
+from battalion.api import CLI, Handler, command
+
+
+SIZES = (10, 100, 1000, 10000)
+QUICK = {'sizes': (10, 100)}
+COMMANDS_PER_HANDLER = 10
+
+_counter = itertools.count()
+
+
+def make_command(name, aliases=0):
+    def cmd(cli, value=None):
+        return value
+    cmd.__name__ = name
+    if aliases:
+        return command(aliases=['{0}_{1}'.format(name, a) for a in range(aliases)])(cmd)
+    return command(cmd)
+
+
+def build_cli(size, per_handler=COMMANDS_PER_HANDLER, aliases=0):
+    """
+    Creates a CLI class with ``size`` commands, one handler per
+    ``per_handler`` commands, each with ``aliases`` aliases, returns the
+    CLI class
+    """
+    cli_name = 'benchcli{0}'.format(next(_counter))
+    handlers = []
+    for h in range(max(size // per_handler, 1)):
+        attrs = dict(('cmd{0}'.format(c), make_command('cmd{0}'.format(c), aliases))
+                     for c in range(per_handler))
+        attrs['State'] = type('State', (), {'cli': cli_name})
+        handlers.append(type(Handler)('handler{0}'.format(h), (Handler,), attrs))
+    attrs = {'State': type('State', (), {'version': '0.0.1'})}
+    return type(CLI)(cli_name, (CLI,), attrs)
+
+
+def build_tree(depth, per_handler=COMMANDS_PER_HANDLER):
+    """
+    Creates a CLI class with a chain of ``depth`` nested handlers, each
+    holding ``per_handler`` commands, returns the CLI class and the argv
+    that reaches a command in the deepest handler
+    """
+    cli_name = 'benchtree{0}'.format(next(_counter))
+    path = []
+    for level in range(depth):
+        name = 'level{0}'.format(level)
+        attrs = dict(('cmd{0}'.format(c), make_command('cmd{0}'.format(c)))
+                     for c in range(per_handler))
+        attrs['State'] = type('State', (), {'cli': cli_name, 'parent': '.'.join(path) or None})
+        type(Handler)(name, (Handler,), attrs)
+        path.append(name)
+    attrs = {'State': type('State', (), {'version': '0.0.1'})}
+    return type(CLI)(cli_name, (CLI,), attrs), path + ['cmd0', '1']
+
+
+def run(sizes=SIZES):
+    results = []
+    for size in sizes:
+        seconds = timeit.timeit(lambda: build_cli(size), number=1)
+        results.append({'commands': size,
+                        'seconds': seconds,
+                        'us_per_command': seconds / size * 1e6})
+    return results
+
+
+def main():
+    print "{0:>10} {1:>12} {2:>16}".format('commands', 'seconds', 'us/command')
+    for result in run():
+        print "{commands:>10} {seconds:>12.4f} {us_per_command:>16.2f}".format(**result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+State compile benchmark
+
+Compiles a State over a large config and reads every key back, then
+compiles it again with only the options changed, the way consecutive
+dispatches in one process do.
+
+    python -m battalion_benchmarks.bench_state
+"""
+from __future__ import absolute_import
+import time
+from battalion.dotify import DotifyDict
+from battalion.state import State
+from . import format_table
+
+
+KEYS = (100, 1000, 10000, 100000)
+QUICK = {'keys': (100, 1000)}
+
+
+class _StubCLI(object):
+    handlers = []
+
+
+def make_config(keys):
+    return DotifyDict(dict(('section{0}'.format(i),
+                            {'value': i, 'items': [i, i + 1], 'nested': {'name': str(i)}})
+                           for i in range(keys)))
+
+
+def compile_state(state, layer, config, options):
+    state.reinit()
+    state.add_state(layer)
+    state.add_config(config)
+    state.add_options(options)
+    start = time.time()
+    state.compile()
+    compiled = time.time()
+    for key in state.keys():
+        state[key]
+    return compiled - start, time.time() - compiled
+
+
+def run(keys=KEYS):
+    results = []
+    for count in keys:
+        state = State()
+        state.cli = _StubCLI()
+        layer = DotifyDict({'msg': 'benchmark', 'debug': False})
+        config = make_config(count)
+        compile_seconds, read_seconds = compile_state(state, layer, config, {'debug': True})
+        recompile_seconds, reread_seconds = compile_state(state, layer, config, {'debug': False})
+        results.append({'keys': count,
+                        'compile_seconds': compile_seconds,
+                        'read_seconds': read_seconds,
+                        'recompile_seconds': recompile_seconds,
+                        'reread_seconds': reread_seconds})
+    return results
+
+
+def main():
+    print format_table(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from battalion.api import Handler, command
+
+
+def shout(cli, msg):
+    """
+    Shouts {msg}
+    """
+    return msg.upper()
+
+
+class lazyhandler(Handler):
+    """
+    Handler that is only imported when dispatched
+    """
+    class State:
+        cli = 'lazycli'
+
+    @command
+    def whisper(cli, msg):
+        return msg.lower()
@@ -0,0 +1,113 @@
+import os
+import json
+import pytest
+from StringIO import StringIO
+from battalion.api import *
+from battalion.batch import parse_line, run_batch
+
+
+class bcli(CLI):
+    """
+    Toplevel program - bcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def add(cli, num1, num2):
+        print 'adding'
+        return float(num1) + float(num2)
+
+    @command
+    def pid(cli):
+        return os.getpid()
+
+    @command
+    def raw(cli, kind):
+        return '\xff\xfe' if kind == 'bytes' else {(1, 2): 'pair'}
+
+    @command
+    def fail(cli):
+        raise SystemExit(3)
+
+
+BATCH = """\
+add 1 2
+# comments and blank lines are skipped
+
+["add", "3", "4"]
+fail
+{"argv": ["add", "5", "6"]}
+nope
+"""
+
+
+def run(jobs=1):
+    output = StringIO()
+    failed = run_batch(bcli(), StringIO(BATCH), output, jobs=jobs)
+    return failed, [json.loads(l) for l in output.getvalue().splitlines()]
+
+
+def test_parse_line():
+    assert parse_line('add "1 2" 3') == ['add', '1 2', '3']
+    assert parse_line('["add", "1 2"]') == ['add', '1 2']
+    assert parse_line('  # add') is None
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_batch(jobs):
+    failed, results = run(jobs)
+    assert failed == 2
+    assert [r['line'] for r in results] == [1, 4, 5, 6, 7]
+    assert [r['status'] for r in results] == ['ok', 'ok', 'error', 'ok', 'error']
+    assert [r['result'] for r in results[:2]] == [3.0, 7.0]
+    assert results[0]['stdout'] == 'adding\n'
+    assert results[2]['exit'] == 3
+    assert 'No such command: nope' in results[4]['stdout']
+
+
+def test_batch_jobs_use_processes():
+    output = StringIO()
+    run_batch(bcli(), StringIO('pid\n' * 6), output, jobs=2)
+    pids = set(json.loads(l)['result'] for l in output.getvalue().splitlines())
+    assert os.getpid() not in pids
+
+
+def test_batch_option(tmpdir, capsys):
+    path = tmpdir.join('batch.txt')
+    path.write('add 1 1\nfail\n')
+    with pytest.raises(SystemExit):
+        bcli().execute(['--batch', str(path)])
+    out, err = capsys.readouterr()
+    assert [json.loads(l)['status'] for l in out.splitlines()] == ['ok', 'error']
+
+
+def test_parse_line_unicode():
+    assert parse_line(u'["add", "caf\\u00e9", "1"]') == ['add', 'caf\xc3\xa9', '1']
+    assert parse_line(u'add caf\xe9') == ['add', 'caf\xc3\xa9']
+    with pytest.raises(ValueError):
+        parse_line('{"args": []}')
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_bad_lines_only_fail_themselves(jobs):
+    output = StringIO()
+    source = StringIO('add 1 2\n["add",\nadd "3 4\n["add", "caf\\u00e9", "1"]\nadd 3 4\n')
+    failed = run_batch(bcli(), source, output, jobs=jobs)
+    results = [json.loads(l) for l in output.getvalue().splitlines()]
+    assert failed == 3
+    assert [(r['line'], r['status']) for r in results] == [
+        (1, 'ok'), (2, 'error'), (3, 'error'), (4, 'error'), (5, 'ok')]
+    assert results[1]['error'].startswith('cannot parse line')
+    assert 'closing quotation' in results[2]['error']
+    assert results[3]['argv'] == ['add', u'caf\xe9', '1']
+    assert results[4]['result'] == 7.0
+
+
+def test_unencodable_results_only_fail_their_line():
+    output = StringIO()
+    failed = run_batch(bcli(), StringIO('raw bytes\nraw keys\nadd 1 2\n'), output)
+    results = [json.loads(l) for l in output.getvalue().splitlines()]
+    assert failed == 2
+    assert [r['status'] for r in results] == ['error', 'error', 'ok']
+    assert all(r['error'].startswith('cannot encode result') for r in results[:2])
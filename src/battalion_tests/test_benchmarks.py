@@ -0,0 +1,26 @@
+from battalion_benchmarks import compare, case_of, format_table
+
+
+BASELINE = {'dispatch': [{'mode': 'warm', 'commands': 10, 'us_per_call': 100.0},
+                         {'mode': 'cold', 'commands': 10, 'us_per_call': 1000.0}]}
+
+
+def test_case_ignores_timings():
+    assert case_of({'mode': 'warm', 'commands': 10, 'us_per_call': 1.0, 'seconds': 2.0}) == \
+        (('commands', 10), ('mode', 'warm'))
+
+
+def test_compare():
+    results = {'dispatch': [{'mode': 'warm', 'commands': 10, 'us_per_call': 200.0},
+                            {'mode': 'cold', 'commands': 10, 'us_per_call': 1100.0},
+                            {'mode': 'warm', 'commands': 100, 'us_per_call': 1.0}],
+               'state': [{'keys': 10, 'compile_seconds': 1.0}]}
+    rows = compare(BASELINE, results, threshold=0.25)
+    assert [(r['case'], r['ratio'], r['regressed']) for r in rows] == [
+        ('commands=10 mode=warm', 2.0, True),
+        ('commands=10 mode=cold', 1.1, False)]
+
+
+def test_format_table():
+    table = format_table(BASELINE['dispatch'])
+    assert table.splitlines()[0].split() == ['commands', 'mode', 'us_per_call']
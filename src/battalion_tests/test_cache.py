@@ -0,0 +1,204 @@
+import os
+import time
+import multiprocessing
+import pytest
+from battalion.api import *
+from battalion.cache import ResultCache, code_hash
+from battalion.plan import Plan
+
+
+calls = []
+
+
+def publish(name):
+    calls.append('publish')
+    return name
+
+
+@fixture
+def renderer(state):
+    calls.append('renderer')
+    return 'rendered'
+
+
+class cachecli(CLI):
+    """
+    Toplevel program - cachecli
+    """
+    class State:
+        version = '0.0.1'
+        region = 'us-east'
+
+    @command(cache=True)
+    def render(cli, renderer, name, style='plain'):
+        calls.append('render')
+        return '{0} {1} {2} in {3}'.format(renderer, name, style, cli.state.region)
+
+    @command(cache=True, cache_state=['region'])
+    def resolve(cli, name):
+        calls.append('resolve')
+        return name.upper()
+
+    @command(cache=0.2)
+    def briefly(cli):
+        calls.append('briefly')
+        return time.time()
+
+    @command(cache=True)
+    def release(cli, name):
+        return dryrun(publish, name)(name)
+
+    @command(cache=True)
+    def listing(cli, n):
+        calls.append('listing')
+        for i in range(int(n)):
+            yield i
+
+
+@pytest.fixture(autouse=True)
+def home(tmpdir, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmpdir))
+    del calls[:]
+    return tmpdir
+
+
+@pytest.fixture
+def cli():
+    return cachecli()
+
+
+def test_repeat_skips_fixtures_and_body(cli, home):
+    assert cli(['render', 'a']) == 'rendered a plain in us-east'
+    assert cli(['render', 'a']) == 'rendered a plain in us-east'
+    assert calls == ['renderer', 'render']
+    assert home.join('.cachecli_cache').check(dir=True)
+
+
+def test_key_normalizes_arguments(cli):
+    cli(['render', 'a'])
+    cli.render(name='a', style='plain')
+    cli(['render', 'b'])
+    assert calls == ['renderer', 'render', 'renderer', 'render']
+
+
+def test_key_includes_state(cli):
+    cli(['render', 'a'])
+    cli(['--debug', 'render', 'a'])
+    assert calls.count('render') == 2
+    cli(['resolve', 'a'])
+    cli(['--debug', 'resolve', 'a'])
+    assert calls.count('resolve') == 1
+
+
+def test_no_cache_refreshes(cli):
+    cli(['resolve', 'a'])
+    cli(['--no-cache', 'resolve', 'a'])
+    cli(['resolve', 'a'])
+    assert calls == ['resolve', 'resolve']
+
+
+def test_ttl(cli):
+    first = cli(['briefly'])
+    assert cli(['briefly']) == first
+    time.sleep(0.25)
+    assert cli(['briefly']) != first
+    assert calls == ['briefly', 'briefly']
+
+
+def test_streams_are_collected(cli):
+    assert cli.listing(n='3') == [0, 1, 2]
+    assert cli.listing(n='3') == [0, 1, 2]
+    assert calls == ['listing']
+
+
+def test_code_hash():
+    def a():
+        return 1
+
+    def b():
+        return 2
+    assert code_hash(a.func_code).digest() != code_hash(b.func_code).digest()
+    assert code_hash(render_code()).digest() == code_hash(render_code()).digest()
+
+
+def render_code():
+    def outer():
+        def inner():
+            return 1
+        return inner
+    return outer.func_code
+
+
+def test_lru_eviction(tmpdir):
+    cache = ResultCache(str(tmpdir), max_bytes=1000)
+    for i in range(4):
+        cache.set('key{0}'.format(i), 'x' * 200)
+        os.utime(cache.path('key{0}'.format(i)), (i, i))
+    # reading key0 makes it the most recently used
+    assert cache.get('key0') == (True, 'x' * 200)
+    cache.set('key4', 'x' * 200)
+    cache.set('key5', 'x' * 200)
+    assert cache.get('key1') == (False, None)
+    assert cache.get('key0') == (True, 'x' * 200)
+    assert cache.get('key5') == (True, 'x' * 200)
+
+
+def test_unpicklable_results_are_not_cached(tmpdir):
+    cache = ResultCache(str(tmpdir))
+    assert cache.set('key', lambda: None) is False
+    assert cache.get('key') == (False, None)
+
+
+def use_cache(args):
+    directory, worker = args
+    cache = ResultCache(directory, max_bytes=20000)
+    for i in range(50):
+        key = 'key{0}'.format(i % 10)
+        cache.set(key, (key, 'x' * 500))
+        hit, value = cache.get(key)
+        assert not hit or value == (key, 'x' * 500)
+    return worker
+
+
+def test_concurrent_processes(tmpdir):
+    pool = multiprocessing.Pool(4)
+    try:
+        assert sorted(pool.map(use_cache, [(str(tmpdir), i) for i in range(4)])) == [0, 1, 2, 3]
+    finally:
+        pool.close()
+    assert not [p for p in tmpdir.visit('.tmp*')]
+
+
+def test_key_ignores_how_results_are_reported(cli, tmpdir):
+    cli(['render', 'a'])
+    cli(['--output', 'json', 'render', 'a'])
+    path = tmpdir.join('records')
+    path.write('a\n')
+    results = list(cli(['--map', str(path), '--jobs', '2', '--threads', '--as-completed', 'render']))
+    assert results[0]['result'] == 'rendered a plain in us-east'
+    assert calls == ['renderer', 'render']
+
+
+def test_unwritable_cache_runs_uncached(cli, home, monkeypatch):
+    home.join('file').write('')
+    monkeypatch.setenv('HOME', str(home.join('file')))
+    assert cli(['render', 'a']) == 'rendered a plain in us-east'
+    assert cli(['render', 'a']) == 'rendered a plain in us-east'
+    assert calls == ['renderer', 'render', 'renderer', 'render']
+
+
+def test_unwritable_entry_is_not_stored(tmpdir):
+    tmpdir.join('ab').write('')
+    cache = ResultCache(str(tmpdir))
+    assert cache.set('abcd', 1) is False
+    assert cache.get('abcd') == (False, None)
+
+
+def test_plan_bypasses_cache(cli, tmpdir):
+    path = str(tmpdir.join('plan.json'))
+    for _ in range(2):
+        cli(['--plan', path, 'release', 'a'])
+        assert Plan.load(path).actions
+    assert calls == []
+    assert cli(['release', 'a']) == 'a'
+    assert calls == ['publish']
@@ -1,4 +1,5 @@
 import sys
+import time
 import pytest
 import logging
 from battalion.api import *
@@ -99,6 +100,11 @@ def multi_bind(cli, name="NAME"):
     name = dryrun(cli.normal_function, 'NAME')(data=name)
     print name
     
+@command(cli='mycli', timeout=0.05)
+def slow(cli, seconds=1):
+    time.sleep(float(seconds))
+    return seconds
+
 registry.bind(multi_bind, 'mycli', 'myhandler2')
 registry.bind(multi_bind, 'acli')
 
@@ -143,6 +149,14 @@ def test_alias(cli, capsys):
     out, err = capsys.readouterr()
     assert 'Hello Kyle!' in out
 
+def test_alias_usage(cli):
+    assert 'greeting [options]' in cli.myhandler.load_command('greeting').__autodoc__
+    assert 'hello [options]' in cli.myhandler.load_command('hello').__autodoc__
+
+def test_invocations_are_reused(cli):
+    assert cli.greeting is cli.greeting
+    assert cli.myhandler.hello is cli.myhandler.hello
+
 def test_nosuchcommand_exception(cli, capsys):
     rv = dispatch(cli, 'hello')
     out, err = capsys.readouterr()
@@ -152,6 +166,102 @@ def test_logger(cli, caplog):
     rv = dispatch(cli, 'myhandler2 logger -mKyle')
     assert 'Kyle' in caplog.text()
 
+def test_argv_with_spaces(cli, capsys):
+    rv = dispatch(cli, ['greeting', 'Kyle Rockman'])
+    out, err = capsys.readouterr()
+    assert 'Hello Kyle Rockman!' in out
+
+def test_argv_with_unbalanced_quote(cli, capsys):
+    dispatch(cli, "greeting O'Brien")
+    out, err = capsys.readouterr()
+    assert "Hello O'Brien!" in out
+
+def test_argv_parsed_once(cli, monkeypatch):
+    from battalion.usage import usage_cache
+    parsed = []
+    parse = usage_cache.parse
+    def counting_parse(owner, source, argv, **kwargs):
+        parsed.append(owner)
+        return parse(owner, source, argv, **kwargs)
+    monkeypatch.setattr(usage_cache, 'parse', counting_parse)
+    dispatch(cli, 'greeting Kyle')
+    assert parsed.count(mycli) == 1
+    dispatch(cli, 'myhandler hello Kyle')
+    assert parsed.count(mycli) == 2
+    assert parsed.count(myhandler) == 1
+
+def test_config(cli, tmpdir):
+    config = tmpdir.join('mycli.cfg')
+    config.write('msg: Configured\n')
+    rv = dispatch(cli, ['--config', str(config), 'normal_function'])
+    assert rv == 'Configured'
+
+def test_timeout(cli):
+    with pytest.raises(CommandTimeout):
+        cli.slow(seconds=0.5)
+    assert cli.slow(seconds=0) == 0
+
+def test_submit(cli):
+    results = [cli.normal_function.submit(data=str(i)) for i in range(5)]
+    assert [r.get(1) for r in results] == ['0', '1', '2', '3', '4']
+
+class nestcli(CLI):
+    """
+    Toplevel program - nestcli
+    """
+    class State:
+        version = '0.0.1'
+        command_workers = 1
+
+    @command(timeout=2)
+    def outer(cli):
+        return cli.inner()
+
+    @command(timeout=1)
+    def inner(cli):
+        return 'inner'
+
+def test_nested_timeouts_do_not_starve_pool():
+    cli = nestcli()
+    assert cli(['outer']) == 'inner'
+
+def test_pool_replaced_when_resized():
+    from battalion.pool import get_pool
+    pool = get_pool('resized', 1)
+    assert get_pool('resized', 1) is pool
+    assert get_pool('resized', 2) is not pool
+    assert get_pool('resized', 2).apply(len, ('ab',)) == 2
+
+class padcli(CLI):
+    """
+    Toplevel program - padcli
+    """
+    class State:
+        version = '0.0.1'
+        column_padding = 10
+
+class widecli(CLI):
+    """
+    Toplevel program - widecli
+    """
+    class State:
+        version = '0.0.1'
+        column_padding = 40
+
+@command(cli='padcli')
+def padded(cli, size='1'):
+    """Sizes it"""
+    return size
+
+registry.bind(padded, 'widecli')
+
+def test_help_kept_per_cli():
+    narrow = padcli().padded.command.__autodoc__
+    wide = widecli().padded.command.__autodoc__
+    assert narrow != wide
+    assert padcli().padded.command.__autodoc__ == narrow
+    assert not hasattr(padded, '__autodoc__')
+
 def test_multi_bind(cli, capsys):
     rv = cli.myhandler2.multi_bind()
     out, err = capsys.readouterr()
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import pytest
+from battalion.api import *
+from battalion.completion import (build_index, write_index, load_index,
+                                  complete, completion_script)
+
+
+class ccli(CLI):
+    """
+    Toplevel program - ccli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command(alias='ls')
+    def list_items(cli, limit=10):
+        """
+        Lists items
+
+        Options:
+            --limit=<N>   How many [default: 10]
+        """
+        return limit
+
+
+class cdb(Handler):
+    """
+    Database commands
+    """
+    class State:
+        cli = 'ccli'
+
+    @command
+    def migrate(cli, target=None):
+        """Migrates to {target}"""
+
+
+@pytest.fixture
+def index():
+    return build_index(ccli())
+
+
+def test_complete_commands(index):
+    candidates = complete(index, [''])
+    assert candidates[:3] == ['cdb', 'list_items', 'ls']
+    assert '--help' in candidates
+    assert complete(index, []) == candidates
+    assert complete(index, ['l']) == ['list_items', 'ls']
+    assert complete(index, ['--de']) == ['--debug']
+
+
+def test_complete_nested(index):
+    assert complete(index, ['cdb', '']) == ['migrate', '--help', '--version']
+    assert complete(index, ['--debug', 'cdb', 'migrate', '--t']) == ['--target']
+    assert complete(index, ['ls', '']) == ['--limit']
+
+
+def test_index_records_sources(index):
+    assert os.path.abspath(__file__.replace('.pyc', '.py')) in index['sources']
+
+
+def test_completion_script():
+    script = completion_script('bash', 'ccli', '/tmp/ccli.json')
+    assert 'complete -o default -F _ccli_complete ccli' in script
+    assert '-m battalion.completion /tmp/ccli.json' in script
+    with pytest.raises(ValueError):
+        completion_script('csh', 'ccli', '/tmp/ccli.json')
+
+
+def test_stale_index_is_rebuilt(tmpdir):
+    source = tmpdir.join('commands.py')
+    source.write('')
+    path = str(tmpdir.join('index.json'))
+    rebuilt = {'commands': {'rebuilt': {'options': []}}, 'options': []}
+    index = {'commands': {}, 'options': [],
+             'sources': {str(source): os.path.getmtime(str(source))},
+             'regenerate': [sys.executable, '-c',
+                            'import json; json.dump({0!r}, open({1!r}, "w"))'.format(rebuilt, path)]}
+    with open(path, 'w') as f:
+        json.dump(index, f)
+    assert load_index(path)['commands'] == {}
+    os.utime(str(source), (time.time(), os.path.getmtime(str(source)) + 10))
+    assert load_index(path)['commands'] == {'rebuilt': {'options': []}}
+
+
+def test_hook_does_not_import_commands(tmpdir):
+    path = str(tmpdir.join('index.json'))
+    write_index(ccli(), path)
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.check_output(
+        [sys.executable, '-c',
+         'import sys; from battalion.completion import main; main(sys.argv[1:]); '
+         'print sorted(m for m in sys.modules if m.startswith("battalion") and sys.modules[m])',
+         path, 'cdb', 'mi'], cwd=src)
+    lines = out.splitlines()
+    assert lines[0] == 'migrate'
+    assert lines[1] == "['battalion', 'battalion.completion']"
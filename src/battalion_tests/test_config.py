@@ -0,0 +1,37 @@
+import os
+import pytest
+from battalion.config import ConfigCache
+
+
+@pytest.fixture
+def cache():
+    return ConfigCache()
+
+
+def test_config_missing(cache, tmpdir):
+    assert cache.load(str(tmpdir.join('nope.cfg'))) is None
+
+
+def test_config_cached(cache, tmpdir, monkeypatch):
+    path = tmpdir.join('a.cfg')
+    path.write('msg: hi\nnested:\n  items: [1, 2]\n')
+    first = cache.load(str(path))
+    assert first.msg == 'hi'
+    monkeypatch.setattr('battalion.config.load_yaml', None)
+    assert cache.load(str(path)) is first
+
+
+def test_config_reparsed_on_change(cache, tmpdir):
+    path = tmpdir.join('a.cfg')
+    path.write('msg: hi\n')
+    assert cache.load(str(path)).msg == 'hi'
+    path.write('msg: changed\n')
+    stat = os.stat(str(path))
+    os.utime(str(path), (stat.st_atime, stat.st_mtime + 10))
+    assert cache.load(str(path)).msg == 'changed'
+
+
+def test_config_cleaned_up(cache, tmpdir):
+    path = tmpdir.join('a.cfg')
+    path.write('--dry-run: true\nhelp: true\n')
+    assert cache.load(str(path)) == {'dry_run': True}
@@ -0,0 +1,79 @@
+import os
+import threading
+import pytest
+from StringIO import StringIO
+from battalion.api import *
+from battalion.daemon import make_server, client
+
+
+class dcli(CLI):
+    """
+    Toplevel program - dcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def echo(cli, words):
+        print words
+        return os.environ.get('DCLI_NAME')
+
+    @command
+    def where(cli):
+        return cli.state.cwd
+
+    @command
+    def raw(cli):
+        return '\x93\xff\x00'
+
+    @command
+    def fail(cli):
+        raise SystemExit(3)
+
+
+@pytest.fixture(params=[False, True], ids=['inprocess', 'fork'])
+def socket_path(request, tmpdir):
+    path = str(tmpdir.join('dcli.sock'))
+    server = make_server(dcli(), path, fork=request.param)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def call(path, argv, **kwargs):
+    out, err = StringIO(), StringIO()
+    code = client(path, argv, stdout=out, stderr=err, **kwargs)
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_daemon_streams_output(socket_path):
+    code, out, err = call(socket_path, ['echo', 'hi'], env={'DCLI_NAME': 'Kyle'})
+    assert code == 0
+    assert out == 'hi\nKyle\n'
+
+
+def test_daemon_exit_code(socket_path):
+    assert call(socket_path, ['fail'])[0] == 3
+    assert call(socket_path, ['nope'])[0] == 1
+    assert call(socket_path, ['echo', 'again'])[0] == 0
+
+
+def test_daemon_cwd(socket_path, tmpdir):
+    code, out, err = call(socket_path, ['where'], cwd=str(tmpdir))
+    assert out.strip() == str(tmpdir)
+    assert os.getcwd() != str(tmpdir)
+
+
+def test_daemon_restores_environment(socket_path):
+    call(socket_path, ['echo', 'hi'], env={'DCLI_NAME': 'Kyle'})
+    assert 'DCLI_NAME' not in os.environ
+
+
+def test_daemon_output_is_binary_safe(socket_path):
+    code, out, err = call(socket_path, ['raw'])
+    assert out == '\x93\xff\x00\n'
+    code, out, err = call(socket_path, ['echo', u'caf\xe9'.encode('utf-8')])
+    assert out == 'caf\xc3\xa9\n'
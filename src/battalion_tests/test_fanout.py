@@ -0,0 +1,130 @@
+import os
+import time
+import pytest
+from battalion.api import *
+
+
+ran = []
+
+
+@fixture(scope='process')
+def worker_token(state):
+    return (os.getpid(), time.time())
+
+
+class mapcli(CLI):
+    """
+    Toplevel program - mapcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def deploy(cli, worker_token, host, version='1', delay=0):
+        """Deploys {version} to {host}"""
+        time.sleep(float(delay))
+        ran.append(host)
+        if host == 'bad':
+            raise ValueError('cannot reach bad')
+        return {'host': host, 'version': version, 'pid': os.getpid(), 'token': worker_token}
+
+
+class mapgroup(Handler):
+    """
+    Grouped commands
+    """
+    class State:
+        cli = 'mapcli'
+
+    @command
+    def ping(cli, host):
+        return 'pong {0}'.format(host)
+
+
+def records(tmpdir, lines):
+    path = tmpdir.join('records')
+    path.write('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_map_in_order(tmpdir):
+    path = records(tmpdir, ['web1', '# comment', '', '["web2", "3"]'])
+    results = list(mapcli()(['--map', path, 'deploy']))
+    assert [(r['record'], r['args'], r['status']) for r in results] == [
+        (1, ['web1'], 'ok'), (4, ['web2', '3'], 'ok')]
+    assert [r['result']['version'] for r in results] == ['1', '3']
+
+
+def test_map_appends_records(tmpdir):
+    path = records(tmpdir, ['2', '3'])
+    results = list(mapcli()(['--map', path, 'deploy', 'web1']))
+    assert [(r['result']['host'], r['result']['version']) for r in results] == [
+        ('web1', '2'), ('web1', '3')]
+
+
+def test_map_handler_command(tmpdir):
+    path = records(tmpdir, ['a', 'b'])
+    results = list(mapcli()(['--map', path, 'mapgroup', 'ping']))
+    assert [r['result'] for r in results] == ['pong a', 'pong b']
+
+
+def test_map_processes_keep_fixtures_per_worker(tmpdir):
+    # built in each worker rather than inherited from an earlier test
+    registry.reset_fixtures('process')
+    path = records(tmpdir, ['web{0} 1 0.02'.format(i) for i in range(12)])
+    results = list(mapcli()(['--map', path, '--jobs', '3', 'deploy']))
+    assert [r['args'][0] for r in results] == ['web{0}'.format(i) for i in range(12)]
+    tokens = {}
+    for r in results:
+        assert r['result']['pid'] != os.getpid()
+        tokens.setdefault(r['result']['pid'], set()).add(tuple(r['result']['token']))
+    assert all(len(t) == 1 for t in tokens.values())
+    assert all(pid == token[0] for pid, t in tokens.items() for token in t)
+
+
+def test_map_threads_as_completed(tmpdir):
+    path = records(tmpdir, ['slow 1 0.3', 'fast1', 'fast2'])
+    results = list(mapcli()(['--map', path, '--jobs', '3', '--threads',
+                             '--as-completed', 'deploy']))
+    assert results[-1]['args'][0] == 'slow'
+    assert set(r['result']['pid'] for r in results) == set([os.getpid()])
+
+
+def test_map_failures_are_summarized(tmpdir, capsys):
+    path = records(tmpdir, ['web1', 'bad', 'web2 --nope'])
+    cli = mapcli()
+    results = []
+    with pytest.raises(SystemExit) as e:
+        for result in cli.execute(['--map', path, '--jobs', '2', 'deploy']):
+            results.append(result)
+    assert e.value.code == 1
+    assert [r['status'] for r in results] == ['ok', 'error', 'error']
+    assert results[1]['error'] == 'ValueError: cannot reach bad'
+    assert 'Usage' in results[2]['error']
+    out, err = capsys.readouterr()
+    assert '2 of 3 records failed' in err
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_map_unparsable_records_are_failures(tmpdir, capsys, jobs):
+    path = records(tmpdir, ['web1', '["web2",', 'web3 "1', 'web4'])
+    results = []
+    with pytest.raises(SystemExit) as e:
+        for result in mapcli().execute(['--map', path, '--jobs', jobs, 'deploy']):
+            results.append(result)
+    assert e.value.code == 1
+    assert [(r['record'], r['status']) for r in results] == [
+        (1, 'ok'), (2, 'error'), (3, 'error'), (4, 'ok')]
+    assert results[1]['error'].startswith('ValueError')
+    assert '2 of 4 records failed' in capsys.readouterr()[1]
+
+
+def test_map_threads_stop_early(tmpdir):
+    path = records(tmpdir, ['web{0} 1 0.05'.format(i) for i in range(40)])
+    del ran[:]
+    results = mapcli().execute(['--map', path, '--jobs', '2', '--threads', 'deploy'])
+    next(results)
+    results.close()
+    time.sleep(0.3)
+    # the records already started finish, the queued ones never run
+    assert len(ran) < 10
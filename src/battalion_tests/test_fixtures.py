@@ -0,0 +1,119 @@
+import time
+import pytest
+from battalion.registry import Registry
+from battalion.exceptions import FixtureError
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def fixture(self, name, value=None):
+        def func(state):
+            self.calls.append(name)
+            return value if value is not None else name
+        return func
+
+
+@pytest.fixture
+def reg():
+    return Registry()
+
+
+def test_fixture_gets_state(reg):
+    reg.register_fixture(lambda s: s, 'thing')
+    assert reg.get_fixture('thing', 'STATE') == 'STATE'
+
+
+def test_fixture_dependencies(reg):
+    def conn(state, url):
+        return 'conn({0})'.format(url)
+    reg.register_fixture(lambda state: state + '/db', 'url')
+    reg.register_fixture(conn, 'conn')
+    assert reg.get_fixtures(('conn',), 'host') == {'conn': 'conn(host/db)'}
+
+
+def test_fixture_scopes(reg):
+    counter = Counter()
+    reg.register_fixture(counter.fixture('inv'), 'inv')
+    reg.register_fixture(counter.fixture('run'), 'run', 'cli-run')
+    reg.register_fixture(counter.fixture('proc'), 'proc', 'process')
+    names = ('inv', 'proc', 'run')
+    reg.get_fixtures(names, None)
+    reg.get_fixtures(names, None)
+    reg.reset_fixtures('cli-run')
+    reg.get_fixtures(names, None)
+    assert counter.calls.count('inv') == 3
+    assert counter.calls.count('run') == 2
+    assert counter.calls.count('proc') == 1
+
+
+def test_fixture_memoized_skips_dependencies(reg):
+    counter = Counter()
+    reg.register_fixture(counter.fixture('dep'), 'dep', 'process')
+    reg.register_fixture(lambda state, dep: dep, 'top', 'process')
+    reg.get_fixtures(('top',), None)
+    reg.reset_fixtures('process')
+    reg.get_fixtures(('top',), None)
+    assert counter.calls == ['dep', 'dep']
+
+
+def test_fixture_scope_mismatch(reg):
+    reg.register_fixture(lambda state: 1, 'narrow')
+    reg.register_fixture(lambda state, narrow: narrow, 'wide', 'process')
+    with pytest.raises(FixtureError):
+        reg.get_fixtures(('wide',), None)
+
+
+def test_fixture_builtins_in_any_scope(reg):
+    class FakeState(object):
+        cli = 'CLI'
+    fake = FakeState()
+    reg.register_fixture(lambda state: state.cli, 'cli')
+    reg.register_fixture(lambda cli, state: (cli, state), 'client', 'process')
+    reg.register_fixture(lambda cli: cli, 'named', 'cli-run')
+    assert reg.get_fixtures(('client', 'named'), fake) == {'client': ('CLI', fake),
+                                                           'named': 'CLI'}
+
+
+def test_fixture_cycle(reg):
+    reg.register_fixture(lambda state, b: b, 'a')
+    reg.register_fixture(lambda state, a: a, 'b')
+    with pytest.raises(FixtureError):
+        reg.get_fixtures(('a',), None)
+
+
+def test_fixture_bad_scope(reg):
+    with pytest.raises(ValueError):
+        reg.register_fixture(lambda state: 1, 'bad', 'session')
+
+
+def sleeper(seconds, value):
+    def func(state):
+        time.sleep(seconds)
+        return value
+    return func
+
+
+def test_fixture_concurrent(reg):
+    for name in ('a', 'b', 'c'):
+        reg.register_fixture(sleeper(0.1, name), name)
+    reg.register_fixture(lambda state, a, b: a + b, 'ab')
+    start = time.time()
+    values = reg.get_fixtures(('ab', 'c'), None, workers=4)
+    assert time.time() - start < 0.25
+    assert values == {'ab': 'ab', 'c': 'c'}
+
+
+def test_fixture_concurrent_error_order(reg):
+    def fail(message, seconds):
+        def func(state):
+            time.sleep(seconds)
+            raise RuntimeError(message)
+        return func
+    reg.register_fixture(fail('first', 0.05), 'first')
+    reg.register_fixture(fail('second', 0), 'second')
+    with pytest.raises(RuntimeError) as e:
+        reg.get_fixtures(('first', 'second'), None, workers=2)
+    assert 'first' in str(e.value)
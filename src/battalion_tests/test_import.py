@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import subprocess
+
+
+# Milliseconds "import battalion.api" may take in a fresh interpreter
+IMPORT_BUDGET = float(os.environ.get('BATTALION_IMPORT_BUDGET', 100))
+
+# Modules that must only be imported when they are actually used
+DEFERRED = ('yaml', 'pyul', 'version', 'pip')
+
+SCRIPT = """
+import sys, time, json
+start = time.time()
+import battalion.api
+elapsed = (time.time() - start) * 1000
+print json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)})
+"""
+
+
+def measure_import():
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.check_output([sys.executable, '-c', SCRIPT], cwd=src)
+    return json.loads(out)
+
+
+def test_import_budget():
+    # best of a few runs so a busy machine does not fail the build
+    elapsed = min(measure_import()['elapsed'] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET
+
+
+def test_import_defers_dependencies():
+    modules = measure_import()['modules']
+    loaded = [m for m in modules if m.split('.')[0] in DEFERRED]
+    assert loaded == []
@@ -0,0 +1,44 @@
+import sys
+from battalion.api import *
+
+
+class lazycli(CLI):
+    """
+    Toplevel program - lazycli
+    """
+    class State:
+        version = '0.0.1'
+
+registry.bind_lazy('lazy_commands:shout', 'lazycli',
+                   aliases=['yell'], doc='Shouts {msg}')
+registry.bind_lazy('lazy_commands:lazyhandler', 'lazycli',
+                   doc='Handler that is only imported when dispatched')
+
+
+def dispatch(cli, argv=None):
+    try:
+        return cli(argv)
+    except SystemExit:
+        return
+
+
+def test_lazy_not_imported(capsys):
+    sys.modules.pop('lazy_commands', None)
+    cli = lazycli()
+    dispatch(cli, '--help')
+    out, err = capsys.readouterr()
+    assert 'Shouts {msg}' in out
+    assert 'Handler that is only imported when dispatched' in out
+    assert 'lazy_commands' not in sys.modules
+
+
+def test_lazy_command():
+    assert dispatch(lazycli(), 'shout hello') == 'HELLO'
+    assert 'lazy_commands' in sys.modules
+    assert dispatch(lazycli(), 'yell hello') == 'HELLO'
+
+
+def test_lazy_handler():
+    cli = lazycli()
+    assert dispatch(cli, 'lazyhandler whisper HELLO') == 'hello'
+    assert cli.lazyhandler.whisper(msg='HI') == 'hi'
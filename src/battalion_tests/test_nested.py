@@ -0,0 +1,121 @@
+import json
+import pytest
+from battalion.api import *
+from battalion.completion import build_index, complete
+
+
+class ncli(CLI):
+    """
+    Toplevel program - ncli
+    """
+    class State:
+        version = '0.0.1'
+        # settings of the program's own, not the handler parent or --output
+        parent = 'org'
+        output = 'table'
+
+
+class cloud(Handler):
+    """
+    Cloud resources
+    """
+    class State:
+        cli = 'ncli'
+        region = 'us-east'
+
+
+class compute(Handler):
+    """
+    Compute resources
+    """
+    class State:
+        cli = 'ncli'
+        parent = 'cloud'
+
+
+class instances(Handler):
+    """
+    Compute instances
+    """
+    class State:
+        cli = 'ncli'
+        parent = 'cloud.compute'
+
+    @command(alias='ls')
+    def list(cli, zone='a'):
+        """Lists the instances in {zone}"""
+        return 'instances in {0}'.format(zone)
+
+    @command
+    def reboot(cli, name):
+        """Reboots {name}"""
+        return cli.cloud.compute.instances.list(zone=name)
+
+
+@command(cli='ncli', handler='cloud.compute.instances')
+def stop(cli, name):
+    """Stops {name}"""
+    return 'stopped {0}'.format(name)
+
+
+@command(cli='ncli', handler='cloud.compute.instances')
+def settings(cli):
+    return cli.state.parent, cli.state.output
+
+
+@pytest.fixture
+def cli():
+    return ncli()
+
+
+def test_nested_keys(cli):
+    assert cli.cloud.key == ('ncli', 'cloud')
+    assert cli.cloud.compute.instances.key == ('ncli', 'cloud', 'compute', 'instances')
+    assert cli.cloud.compute.instances.path == 'cloud.compute.instances'
+    assert sorted(cli.cloud.compute.instances.commands) == ['list', 'ls', 'reboot', 'settings', 'stop']
+
+
+def test_nested_dispatch(cli):
+    assert cli(['cloud', 'compute', 'instances', 'list', 'b']) == 'instances in b'
+    assert cli(['cloud', 'compute', 'instances', 'ls']) == 'instances in a'
+    assert cli(['cloud', 'compute', 'instances', 'stop', 'web']) == 'stopped web'
+    assert cli(['cloud', 'compute', 'instances', 'reboot', 'c']) == 'instances in c'
+
+
+def test_nested_keeps_program_settings(cli):
+    assert cli(['cloud', 'compute', 'instances', 'settings']) == ('org', 'table')
+    assert cli(['--output', 'json', 'cloud', 'compute', 'instances', 'settings']) == ('org', 'table')
+
+
+def test_nested_help(cli, capsys):
+    cli(['cloud', 'compute', '--help'])
+    out, err = capsys.readouterr()
+    assert 'instances' in out
+    assert 'Compute instances' in out
+
+
+def test_nested_no_such_command(cli, capsys):
+    cli(['cloud', 'compute', 'nope'])
+    out, err = capsys.readouterr()
+    assert 'No such command: nope' in out
+    assert 'instances' in out
+
+
+def test_nested_trace(cli, tmpdir):
+    path = tmpdir.join('trace.json')
+    cli(['--trace', str(path), '--trace-format', 'json',
+         'cloud', 'compute', 'instances', 'stop', 'web'])
+    events = []
+
+    def walk(spans):
+        for span in spans:
+            if 'command' in span:
+                events.append((span['command'], span['handler']))
+            walk(span['children'])
+    walk(json.loads(path.read()))
+    assert events == [('stop', 'cloud.compute.instances')]
+
+
+def test_nested_completion(cli):
+    index = build_index(cli)
+    assert complete(index, ['cloud', 'compute', 'instances', 'l']) == ['list', 'ls']
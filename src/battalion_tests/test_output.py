@@ -0,0 +1,96 @@
+import json
+import pytest
+from StringIO import StringIO
+from battalion.api import *
+from battalion.output import write, check_format, encode_json
+
+
+class Thing(object):
+
+    def __repr__(self):
+        return '<Thing>'
+
+
+class ocli(CLI):
+    """
+    Toplevel program - ocli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def show(cli, name='web'):
+        return {'name': name, 'ports': [80, 443]}
+
+    @command
+    def items(cli, n=2):
+        for i in range(int(n)):
+            yield {'id': i}
+
+    @command
+    def quiet(cli):
+        print 'printed'
+
+
+def output(argv, capsys):
+    ocli.main(argv)
+    return capsys.readouterr()[0]
+
+
+def test_text_is_default(capsys):
+    assert output(['items'], capsys) == "{'id': 0}\n{'id': 1}\n"
+
+
+def test_json(capsys):
+    assert json.loads(output(['--output', 'json', 'show', 'db'], capsys)) == \
+        {'name': 'db', 'ports': [80, 443]}
+    assert json.loads(output(['--output', 'json', 'items', '3'], capsys)) == \
+        [{'id': 0}, {'id': 1}, {'id': 2}]
+
+
+def test_jsonl(capsys):
+    lines = output(['--output=jsonl', 'items', '3'], capsys).splitlines()
+    assert [json.loads(l) for l in lines] == [{'id': 0}, {'id': 1}, {'id': 2}]
+
+
+def test_none_writes_nothing(capsys):
+    assert output(['--output=json', 'quiet'], capsys) == 'printed\n'
+
+
+def test_empty_stream():
+    stream = StringIO()
+    write(iter([]), 'json', stream)
+    assert stream.getvalue() == '[]\n'
+
+
+def test_unencodable_values():
+    assert json.loads(encode_json({'thing': Thing(), 'text': u'caf\xe9'})) == \
+        {'thing': '<Thing>', 'text': u'caf\xe9'}
+
+
+def test_unencodable_keys_and_bytes():
+    assert json.loads(encode_json({(1, 2): 'pair'})) == "{(1, 2): 'pair'}"
+    assert json.loads(encode_json(['\xff'])) == "['\\xff']"
+
+
+def test_json_encoders_agree():
+    value = {'size': 1234.56789012345, 'path': 'a/b'}
+    encoded = encode_json(value)
+    assert json.loads(encoded) == value
+    assert '\\/' not in encoded
+
+
+def test_unknown_format(capsys):
+    with pytest.raises(SystemExit) as e:
+        ocli().execute(['--output=yaml', 'show'])
+    assert 'json, jsonl, msgpack, text' in e.value.code
+    assert check_format('jsonl') is None
+
+
+def test_msgpack():
+    msgpack = pytest.importorskip('msgpack')
+    stream = StringIO()
+    write(ocli().items(n=3), 'msgpack', stream)
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(stream.getvalue())
+    assert list(unpacker) == [{'id': 0}, {'id': 1}, {'id': 2}]
@@ -0,0 +1,125 @@
+import time
+import json
+import pytest
+from battalion.api import *
+from battalion.exceptions import PlanError
+from battalion.plan import Plan, Action
+
+
+applied = []
+
+
+def restart(service):
+    applied.append(('restart', service))
+    return service
+
+
+class pcli(CLI):
+    """
+    Toplevel program - pcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def create(cli, name, delay=0):
+        time.sleep(float(delay))
+        applied.append(('create', name))
+        return name
+
+    @command
+    def rollout(cli, delay=0):
+        first = dryrun(cli.create, 'vm-a', independent=True)(name='a', delay=delay)
+        dryrun(cli.create, 'vm-b', independent=True)(name='b', delay=delay)
+        dryrun(cli.create, 'vm-c', independent=True)(name=first, delay=delay)
+        dryrun(restart, 'restarted')('web')
+
+    @command
+    def upgrade(cli):
+        dryrun(restart)('db')
+        dryrun(restart)('web')
+        dryrun(cli.create, 'vm-a')(name='a')
+        # an equal string is not the dry run value
+        dryrun(restart)('vm-a')
+
+    @command
+    def explode(cli):
+        raise ValueError('boom')
+
+
+@pytest.fixture(autouse=True)
+def clear_applied():
+    del applied[:]
+
+
+def test_plan_records_dependencies(tmpdir):
+    path = tmpdir.join('plan.json')
+    pcli()(['--plan', str(path), 'rollout'])
+    assert applied == []
+    plan = Plan.load(str(path))
+    assert str(plan.actions[0]) == "create(delay=u'0', name=u'a')"
+    assert str(plan.actions[2]) == "create(delay=u'0', name=<result of 0>)"
+    assert plan.actions[0].target == {'command': 'create', 'handler': None}
+    assert plan.actions[3].target == {'callable': 'test_plan:restart'}
+    assert [a.depends for a in plan] == [[], [], [0], [0, 1, 2]]
+    assert [[a.index for a in level] for level in plan.levels()] == [[0, 1], [2], [3]]
+
+
+def test_apply_plan(tmpdir):
+    path = tmpdir.join('plan.json')
+    pcli()(['--plan', str(path), 'rollout'])
+    results = pcli()(['--apply-plan', str(path)])
+    assert results == ['a', 'b', 'a', 'web']
+    assert applied == [('create', 'a'), ('create', 'b'), ('create', 'a'),
+                       ('restart', 'web')]
+
+
+def test_plan_keeps_call_order(tmpdir):
+    path = tmpdir.join('plan.json')
+    pcli()(['--plan', str(path), 'upgrade'])
+    plan = Plan.load(str(path))
+    assert [a.depends for a in plan] == [[], [0], [1], [2]]
+    assert plan.actions[3].args == ['vm-a']
+    pcli()(['--apply-plan', str(path), '--jobs', '2'])
+    assert applied == [('restart', 'db'), ('restart', 'web'), ('create', 'a'),
+                       ('restart', 'vm-a')]
+
+
+def test_plan_replaces_nested_results():
+    plan = Plan()
+    first = plan.record(restart, ('a',), {}, 'vm-a', independent=True)
+    plan.record(restart, ([first, 'b'],), {}, independent=True)
+    plan = Plan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    assert plan.actions[1].depends == [0]
+    assert plan.execute(pcli()) == ['a', ['a', 'b']]
+
+
+def test_apply_plan_concurrently(tmpdir):
+    path = tmpdir.join('plan.json')
+    pcli()(['--plan', str(path), 'rollout', '0.2'])
+    start = time.time()
+    pcli()(['--apply-plan', str(path), '--jobs', '2'])
+    # a and b together, then c, rather than 0.6s one after the other
+    assert time.time() - start < 0.55
+    assert applied[2:] == [('create', 'a'), ('restart', 'web')]
+
+
+def test_plan_stops_at_failed_level():
+    plan = Plan([Action(0, {'command': 'explode', 'handler': None}, [], {}, []),
+                 Action(1, {'command': 'create', 'handler': None}, [], {'name': 'a'}, []),
+                 Action(2, {'command': 'create', 'handler': None}, [], {'name': 'b'}, [0])])
+    with pytest.raises(ValueError):
+        plan.execute(pcli(), workers=2)
+    assert applied == [('create', 'a')]
+
+
+def test_plan_rejects_unsaveable_arguments(tmpdir):
+    plan = Plan()
+    plan.record(restart, (object(),), {})
+    with pytest.raises(PlanError):
+        plan.dump(str(tmpdir.join('plan.json')))
+
+
+def test_plan_version():
+    with pytest.raises(PlanError):
+        Plan.from_dict({'version': 99, 'actions': []})
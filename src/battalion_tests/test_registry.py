@@ -0,0 +1,69 @@
+import pytest
+from battalion.registry import Registry
+
+
+def func(cli):
+    pass
+
+
+def other(cli):
+    pass
+
+
+@pytest.fixture
+def reg():
+    return Registry()
+
+
+def test_is_cached_unhashable(reg):
+    assert not reg.is_cached([])
+    assert not reg.is_cached({})
+
+
+def test_register_with_cached_aliases(reg):
+    reg.register(func, 'func', (None,), aliases=['f', 'fn'])
+    assert reg.is_cached(func)
+    assert reg.get_aliases(func) == ['f', 'fn']
+    reg.register(func, 'func', ('cli',))
+    assert sorted(reg.get_commands(('cli',))) == ['f', 'fn', 'func']
+
+
+def test_alias_reassigned(reg):
+    reg.register(func, 'func', (None,), aliases=['f'])
+    reg.register(other, 'other', (None,), aliases=['f'])
+    assert reg.get_aliases(func) == []
+    assert reg.get_aliases(other) == ['f']
+
+
+def test_register_duplicate(reg):
+    reg.register(func, 'func', ('cli',))
+    with pytest.raises(ValueError):
+        reg.register(other, 'func', ('cli',))
+
+
+def test_aliases_share_the_function(reg):
+    reg.register(func, 'func', ('cli',), aliases=['f'])
+    commands = reg.get_commands(('cli',))
+    assert commands['func'].func is func
+    assert commands['func'].__name__ == 'func'
+    alias = commands['f']
+    assert alias.func is func
+    assert alias.__name__ == 'f'
+    assert alias.__command_spec__ is func.__command_spec__
+    assert alias.func_code is func.func_code
+    assert not hasattr(alias, '__autodoc__')
+    func.__autodoc__ = 'Usage:\n    func'
+    assert not hasattr(alias, '__autodoc__')
+    del func.__autodoc__
+
+
+def test_alias_reports_the_function_module(reg):
+    from battalion.completion import source_file
+    from battalion.cache import cache_key, CachePolicy
+    reg.register(func, 'func', ('cli',), aliases=['f'])
+    alias = reg.get_commands(('cli',))['f']
+    assert alias.__module__ == func.__module__
+    assert alias.__wrapped__ is func
+    assert source_file(alias) == source_file(func)
+    assert cache_key(alias, {}, {}, CachePolicy(state=())) == \
+        cache_key(func, {}, {}, CachePolicy(state=()))
@@ -0,0 +1,92 @@
+import pytest
+from StringIO import StringIO
+from battalion.api import *
+from battalion.shell import Shell
+from battalion.usage import usage_cache
+
+
+calls = []
+
+
+@fixture(scope='process')
+def conn(state):
+    calls.append('conn')
+    return 'connection'
+
+
+class scli(CLI):
+    """
+    Toplevel program - scli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def query(cli, conn, sql='select'):
+        """
+        Runs {sql}
+
+        Options:
+            --sql=<SQL>   The query [default: select]
+        """
+        print '{0}: {1}'.format(conn, sql)
+
+    @command
+    def fail(cli):
+        raise SystemExit(3)
+
+
+class sdb(Handler):
+    """
+    Database commands
+    """
+    class State:
+        cli = 'scli'
+
+    @command(alias='ls')
+    def tables(cli):
+        print 'tables'
+
+
+@pytest.fixture
+def shell(tmpdir):
+    return Shell(scli(), history=str(tmpdir.join('history')))
+
+
+def run(shell, lines):
+    shell.stdin = StringIO(lines)
+    shell.use_rawinput = False
+    shell.run()
+
+
+def test_shell_runs_lines(shell, capsys):
+    run(shell, 'query\nquery --sql=insert\nsdb ls\n\nfail\n')
+    out, err = capsys.readouterr()
+    assert 'connection: select\n' in out
+    assert 'connection: insert\n' in out
+    assert 'tables\n' in out
+    assert shell.exit_code == 3
+    assert calls == ['conn']
+
+
+def test_shell_keeps_going_after_errors(shell, capsys):
+    run(shell, 'nope\n"unbalanced\nsdb tables\nexit\nsdb tables\n')
+    out, err = capsys.readouterr()
+    assert 'No such command: nope' in out
+    assert out.count('tables\n') == 1
+
+
+def test_shell_reuses_usage(shell, monkeypatch):
+    run(shell, 'query\n')
+    compiled = []
+    monkeypatch.setattr('battalion.usage.CompiledUsage',
+                        lambda source: compiled.append(source))
+    run(shell, 'query\nsdb tables\nquery\n')
+    assert compiled == []
+
+
+def test_shell_completion(shell):
+    assert shell.completenames('q') == ['query']
+    assert shell.completedefault('', 'sdb ', 4, 4) == [
+        'ls', 'tables', '--help', '--version']
+    assert shell.completedefault('--s', 'query --s', 6, 9) == ['--sql']
@@ -0,0 +1,32 @@
+from battalion.spec import CommandSpec, get_spec
+
+
+def func(cli, db, name, greeting="Hello", *args, **kwargs):
+    pass
+
+
+def test_spec_callargs():
+    spec = CommandSpec(func)
+    assert spec.args == ('cli', 'db', 'name', 'greeting')
+    assert spec.callargs == {'cli': None, 'db': None, 'name': None,
+                             'greeting': 'Hello', 'args': (), 'kwargs': {}}
+
+
+def test_spec_fixture_split():
+    spec = CommandSpec(func)
+    fixtures = frozenset(['cli', 'db'])
+    assert spec.fixture_args(fixtures) == ('cli', 'db')
+    assert spec.command_args(fixtures) == ('name', 'greeting')
+    assert 'db' not in spec.command_kwargs(fixtures)
+    assert spec.command_args(frozenset(['cli'])) == ('db', 'name', 'greeting')
+
+
+def test_spec_option_key():
+    spec = CommandSpec(func)
+    assert spec.option_key('--dry-run') == 'dry_run'
+    assert spec.option_key('-m') == 'm'
+    assert spec.option_key('<name>') == 'name'
+
+
+def test_get_spec_is_cached():
+    assert get_spec(func) is get_spec(func)
@@ -0,0 +1,114 @@
+import pytest
+from battalion.api import CLI
+from battalion.base import BaseCommand
+from battalion.dotify import DotifyDict
+from battalion.state import State
+
+
+class FakeCLI(object):
+    handlers = []
+
+
+@pytest.fixture
+def state():
+    s = State()
+    s.cli = FakeCLI()
+    return s
+
+
+def compile_state(s, states=(), configs=(), options=()):
+    s.reinit()
+    for layer in states:
+        s.add_state(layer)
+    for layer in configs:
+        s.add_config(layer)
+    for layer in options:
+        s.add_options(layer)
+    s.compile()
+    return s
+
+
+def test_state_precedence(state):
+    cli_state = DotifyDict({'msg': 'state', 'url': 'state', 'name': 'state'})
+    config = DotifyDict({'msg': 'config', 'url': 'config'})
+    cli_options = DotifyDict({'msg': 'cli', 'name': None})
+    handler_options = DotifyDict({'msg': 'handler', 'debug': False})
+    compile_state(state, [cli_state], [config], [cli_options, handler_options])
+    assert state.msg == 'cli'
+    assert state.url == 'config'
+    assert state.name == 'state'
+    assert state.debug is False
+    assert state.missing is None
+
+
+def test_state_merges_without_changing_layers(state):
+    base = DotifyDict({'db': {'host': 'a', 'port': 1}, 'tags': ['a']})
+    config = DotifyDict({'db': {'host': 'b'}, 'tags': ['b']})
+    compile_state(state, [base], [config])
+    assert state.db == {'host': 'b', 'port': 1}
+    assert state['db.port'] == 1
+    assert state.tags == ['a', 'b']
+    assert base == {'db': {'host': 'a', 'port': 1}, 'tags': ['a']}
+    assert config == {'db': {'host': 'b'}, 'tags': ['b']}
+
+
+def test_state_incremental_compile(state):
+    base = DotifyDict({'msg': 'state', 'url': 'state'})
+    compile_state(state, [base], options=[DotifyDict({'msg': 'one'})])
+    assert state.msg == 'one'
+    assert state.url == 'state'
+    compile_state(state, [base], options=[DotifyDict({'msg': 'two'})])
+    assert state.msg == 'two'
+    compile_state(state, [base], options=[DotifyDict({'url': 'three'})])
+    assert state.msg == 'state'
+    assert state.url == 'three'
+
+
+def test_state_overrides(state):
+    compile_state(state, [DotifyDict({'msg': 'state'})])
+    state.msg = 'set'
+    assert state.msg == 'set'
+    assert 'msg' in state
+    assert dict(state.items())['msg'] == 'set'
+    compile_state(state, [DotifyDict({'msg': 'state'})])
+    assert state.msg == 'state'
+    assert isinstance(state.cli, FakeCLI)
+
+
+def test_state_mixin_keeps_class_options():
+    options = list(BaseCommand.State.options)
+
+    class statecli(CLI):
+        class State:
+            options = [('--thing', 'A thing')]
+
+    statecli()
+    statecli()
+    assert BaseCommand.State.options == options
+    assert statecli()._state.options[-2:] == [('--thing', 'A thing'),
+                                              ('--config=<CONFIG>', 'The config filepath [default: ~/.statecli.cfg]')]
+
+
+def test_state_values_do_not_change_layers(state):
+    config = DotifyDict({'tags': ['a'], 'db': {'hosts': ['h1']}, 'seen': set([1])})
+    for _ in range(3):
+        compile_state(state, configs=[config])
+        state.tags.append('x')
+        state.db.hosts.append('h2')
+        state.seen.add(2)
+    assert config == {'tags': ['a'], 'db': {'hosts': ['h1']}, 'seen': set([1])}
+    compile_state(state, configs=[config])
+    assert state.tags == ['a']
+
+
+def test_state_keys_kept_per_compile(state, monkeypatch):
+    compile_state(state, [DotifyDict({'msg': 'state', 'url': None})],
+                  options=[DotifyDict({'name': None, 'debug': True})])
+    assert sorted(state.keys()) == ['cli', 'debug', 'msg', 'url']
+    monkeypatch.setattr(State, '_resolve', None)
+    assert len(state) == 4
+    monkeypatch.undo()
+    state.extra = 1
+    assert 'extra' in state.keys()
+    state.pop('extra', None)
+    assert 'extra' not in state.keys()
@@ -0,0 +1,112 @@
+import errno
+import pytest
+from battalion.api import *
+from battalion.utils import is_stream
+from battalion.output import write as write_output
+from battalion.batch import run_line
+
+
+produced = []
+
+
+class streamcli(CLI):
+    """
+    Toplevel program - streamcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def count(cli, n=3):
+        for i in range(int(n)):
+            produced.append(i)
+            yield 'item {0}'.format(i)
+
+    @command
+    def broken(cli):
+        yield 'first'
+        raise ValueError('boom')
+
+    @command
+    def listing(cli):
+        return ['a', 'b']
+
+
+@pytest.fixture(autouse=True)
+def clear_produced():
+    del produced[:]
+
+
+class Recorder(object):
+
+    def __init__(self, fail_after=None):
+        self.writes = []
+        self.fail_after = fail_after
+
+    def write(self, data):
+        if self.fail_after is not None and len(self.writes) >= self.fail_after:
+            raise IOError(errno.EPIPE, 'Broken pipe')
+        # how much had been produced when each write happened
+        self.writes.append((data, len(produced)))
+
+    def flush(self):
+        pass
+
+
+def test_is_stream():
+    assert is_stream(iter([1]))
+    assert is_stream(x for x in [1])
+    assert not is_stream([1])
+    assert not is_stream('abc')
+    assert not is_stream({'a': 1})
+
+
+def test_invocation_is_lazy():
+    rv = streamcli().count(n=2)
+    assert is_stream(rv)
+    assert produced == []
+    assert list(rv) == ['item 0', 'item 1']
+
+
+def test_main_streams(capsys):
+    streamcli.main(['count', '3'])
+    out, err = capsys.readouterr()
+    assert out == 'item 0\nitem 1\nitem 2\n'
+
+
+def test_main_prints_lists(capsys):
+    streamcli.main(['listing'])
+    out, err = capsys.readouterr()
+    assert out == "['a', 'b']\n"
+
+
+def test_output_is_written_as_it_is_produced():
+    stream = Recorder()
+    write_output(streamcli().count(n=100), stream=stream, buffer_size=70)
+    data = ''.join(d for d, _ in stream.writes)
+    assert data == ''.join('item {0}\n'.format(i) for i in range(100))
+    assert len(stream.writes) > 10
+    assert stream.writes[0][1] < 100
+
+
+def test_output_stops_on_closed_pipe():
+    stream = Recorder(fail_after=1)
+    write_output(streamcli().count(n=100), stream=stream, buffer_size=7)
+    assert len(stream.writes) == 1
+    assert len(produced) == 2
+
+
+def test_output_failure_exits(capsys):
+    cli = streamcli()
+    with pytest.raises(SystemExit) as e:
+        cli.write_result(cli.execute(['broken']))
+    assert e.value.code == 1
+    out, err = capsys.readouterr()
+    assert 'first\n' in out
+    assert 'boom' in err
+
+
+def test_batch_collects_streams():
+    result = run_line(streamcli(), 1, ['count', '2'])
+    assert result['result'] == ['item 0', 'item 1']
+    assert result['status'] == 'ok'
@@ -0,0 +1,80 @@
+import pytest
+from battalion.api import *
+from battalion.timing import phase, add_hook, remove_hook, Profiler, _NO_PHASE
+
+
+@fixture
+def greeting_word(state):
+    return 'Hi'
+
+
+class tcli(CLI):
+    """
+    Toplevel program - tcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def outer(cli, name='World'):
+        return cli.inner(name=name)
+
+    @command
+    def inner(cli, greeting_word, name='World'):
+        return '{0} {1}'.format(greeting_word, name)
+
+
+@pytest.fixture
+def phases():
+    finished = []
+    add_hook(finished.append)
+    yield finished
+    remove_hook(finished.append)
+
+
+def test_no_hooks_no_phases():
+    assert phase('anything') is _NO_PHASE
+
+
+def test_hook_gets_nested_phases(phases):
+    assert tcli()(['outer', 'Kyle']) == 'Hi Kyle'
+    paths = [p.path for p in phases]
+    assert ('tcli',) == paths[-1]
+    assert ('tcli', 'outer', 'inner', 'fixtures') in paths
+    assert ('tcli', 'parse options') in paths
+    assert ('tcli', 'compile state') in paths
+    root = phases[-1]
+    assert root.seconds >= sum(c.seconds for c in root.children)
+
+
+def test_hook_removed():
+    finished = []
+    add_hook(finished.append)
+    remove_hook(finished.append)
+    tcli()(['outer'])
+    assert finished == []
+
+
+def test_profiler():
+    with Profiler() as profiler:
+        with phase('outer'):
+            with phase('inner'):
+                pass
+    assert [p.name for p in profiler.roots] == ['outer']
+    lines = profiler.format().splitlines()
+    assert lines[1].startswith('outer ')
+    assert lines[2].startswith('  inner ')
+
+
+def test_profile_option(capsys):
+    assert tcli()(['--profile', 'outer', 'Kyle']) == 'Hi Kyle'
+    out, err = capsys.readouterr()
+    assert 'total ms' in err
+    assert '\n    inner ' in err
+
+
+def test_profile_option_with_hook(phases, capsys):
+    tcli()(['--profile', 'outer', 'Kyle'])
+    out, err = capsys.readouterr()
+    assert '\n    inner ' in err
+    assert phases[-1].path == ('tcli',)
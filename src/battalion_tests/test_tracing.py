@@ -0,0 +1,103 @@
+import json
+import pytest
+from battalion.api import *
+from battalion.tracing import Tracer
+
+
+@fixture
+def session(state):
+    return 'session'
+
+
+class trcli(CLI):
+    """
+    Toplevel program - trcli
+    """
+    class State:
+        version = '0.0.1'
+
+    @command
+    def deploy(cli, password='hunter2'):
+        cli.trhandler.step(name='one')
+        cli.trhandler.step(name='two')
+        return 'deployed'
+
+
+class trhandler(Handler):
+    """
+    Deployment steps
+    """
+    class State:
+        cli = 'trcli'
+
+    @command
+    def step(cli, session, name=None):
+        if name == 'fail':
+            raise ValueError(name)
+        return name
+
+    @command
+    def broken(cli):
+        cli.trhandler.step(name='fail')
+
+    @command(timeout=5)
+    def timed(cli):
+        return cli.trhandler.step.submit(name='pooled').get(5)
+
+
+def spans(tree):
+    for span in tree:
+        yield span
+        for child in spans(span['children']):
+            yield child
+
+
+def test_trace_json(tmpdir):
+    path = tmpdir.join('trace.json')
+    assert trcli()(['--trace', str(path), '--trace-format', 'json', 'deploy']) == 'deployed'
+    tree = json.loads(path.read())
+    commands = [s for s in spans(tree) if 'command' in s]
+    assert [(s['command'], s['handler']) for s in commands] == [
+        ('deploy', None), ('step', 'trhandler'), ('step', 'trhandler')]
+    deploy, one, two = commands
+    assert deploy['arguments'] == {'password': '***'}
+    assert one['arguments'] == {'name': 'one'}
+    assert sorted(one['fixtures']) == ['cli', 'session']
+    assert [c['command'] for c in deploy['children'] if 'command' in c] == ['step', 'step']
+    assert all(s['outcome'] == 'ok' for s in commands)
+    assert deploy['seconds'] >= one['seconds'] + two['seconds']
+
+
+def test_trace_spans_on_pool_threads(tmpdir):
+    path = tmpdir.join('trace.json')
+    trcli()(['--trace', str(path), '--trace-format', 'json', 'trhandler', 'timed'])
+    tree = json.loads(path.read())
+    assert [root['name'] for root in tree] == ['trcli']
+    timed = [s for s in spans(tree) if s.get('command') == 'timed'][0]
+    assert [s['arguments'] for s in spans(timed['children']) if 'command' in s] == [
+        {'name': 'pooled'}]
+
+
+def test_trace_chrome(tmpdir):
+    path = tmpdir.join('trace.json')
+    trcli()(['--trace', str(path), 'trhandler', 'step', '--name', 'x'])
+    events = json.loads(path.read())['traceEvents']
+    assert events[0]['name'] == 'trcli'
+    step = [e for e in events if e['cat'] == 'command']
+    assert [e['name'] for e in step] == ['step']
+    assert step[0]['ph'] == 'X'
+    assert step[0]['args']['arguments'] == {'name': 'x'}
+
+
+def test_trace_error_outcome(tmpdir):
+    path = tmpdir.join('trace.json')
+    trcli()(['--trace', str(path), '--trace-format', 'json', 'trhandler', 'broken'])
+    commands = [s for s in spans(json.loads(path.read())) if 'command' in s]
+    assert [(s['command'], s['outcome'], s.get('error')) for s in commands] == [
+        ('broken', 'error', 'ValueError'), ('step', 'error', 'ValueError')]
+
+
+def test_tracer_redact():
+    tracer = Tracer(redact=['name'])
+    assert tracer.redacted({'name': 'x', 'Hostname': 'y', 'other': 1}) == {
+        'name': '***', 'Hostname': '***', 'other': 1}
@@ -0,0 +1,48 @@
+import pytest
+from docopt import DocoptExit
+from battalion.usage import UsageCache
+
+
+DOC = """
+Usage:
+    prog [options] <command> [<args>...]
+
+Options:
+    --msg=<MSG>        The message [default: hi]
+"""
+
+
+@pytest.fixture
+def cache():
+    return UsageCache()
+
+
+def test_usage_is_compiled_once(cache):
+    first = cache.get('prog', DOC)
+    assert cache.get('prog', DOC) is first
+
+
+def test_usage_recompiled_on_change(cache):
+    first = cache.get('prog', DOC)
+    assert cache.get('prog', DOC.replace('hi', 'bye')) is not first
+
+
+def test_usage_parse(cache):
+    options = cache.parse('prog', DOC, ['--msg', 'yo', 'cmd', 'a', 'b'],
+                          options_first=True)
+    assert options['--msg'] == 'yo'
+    assert options['<command>'] == 'cmd'
+    assert options['<args>'] == ['a', 'b']
+
+
+def test_usage_parse_does_not_leak_defaults(cache):
+    options = cache.parse('prog', DOC, ['cmd'], options_first=True)
+    options['<args>'].append('leak')
+    options = cache.parse('prog', DOC, ['cmd'], options_first=True)
+    assert options['<args>'] == []
+    assert options['--msg'] == 'hi'
+
+
+def test_usage_parse_error(cache):
+    with pytest.raises(DocoptExit):
+        cache.parse('prog', DOC, ['--nope'])
@@ -15,7 +15,9 @@ class Obj():
 # This is great for lazy object creation and / or only instantiating an object
 # just in time for when its needed  -  This is very similar to how pytest
 # fixtures work
-@fixture
+# The scope decides how long the object lives, "cli-run" shares it with
+# every nested command called during a single run of the cli
+@fixture(scope='cli-run')
 def obj(state):
     # If you control the object you can have the object configure itself from
     # the state object, or you can instantiate the object and configure it 